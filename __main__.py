@@ -10,5 +10,26 @@ import settings
 import vpc
 import alb
 import nginx_config
+import cloudwatch_agent
 import user_data
-import autoscaling_group
\ No newline at end of file
+import webserver_image
+import monitoring
+import autoscaling_group
+import nginx_reload
+import cdn
+
+"""
+Stack Outputs
+"""
+alb_scheme = "https" if settings.alb_https_enabled else "http"
+pulumi.export("alb_dns_name", alb.demo_alb.dns_name)
+pulumi.export("alb_url", pulumi.Output.concat(f"{alb_scheme}://", alb.demo_alb.dns_name))
+if settings.alb_access_logs_enabled:
+    pulumi.export("alb_log_bucket", alb.demo_alb_log_bucket.bucket)
+
+# With CloudFront in front, the ALB only answers origin-verified requests, so clients go through the distribution:
+if settings.cdn_enabled:
+    pulumi.export("cdn_domain_name", cdn.demo_cdn.domain_name)
+    pulumi.export("endpoint_url", pulumi.Output.concat("https://", cdn.demo_cdn.domain_name))
+else:
+    pulumi.export("endpoint_url", pulumi.Output.concat(f"{alb_scheme}://", alb.demo_alb.dns_name))
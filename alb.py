@@ -1,7 +1,14 @@
+import json
 import pulumi
-from pulumi_aws import lb, ec2, config
+from pulumi_aws import lb, ec2, s3, elb, config
 from vpc import demo_vpc, demo_public_subnets, demo_private_subnets
-from settings import general_tags, nginx_stub_status_port, nginx_stub_statuc_path
+from settings import general_tags, nginx_stub_status_port
+from settings import (alb_target_group_algorithm, alb_target_group_slow_start, alb_target_group_deregistration_delay,
+    alb_target_group_stickiness_enabled, alb_target_group_stickiness_duration)
+from settings import (alb_health_check_path, alb_health_check_interval, alb_health_check_timeout,
+    alb_health_check_healthy_threshold, alb_health_check_unhealthy_threshold)
+from settings import alb_certificate_arn, alb_https_enabled, alb_ssl_policy, alb_http2_enabled, alb_idle_timeout, cdn_enabled
+from settings import alb_access_logs_enabled, alb_access_logs_prefix, alb_access_logs_expiration_days, alb_deletion_protection_enabled
 
 """
 PR.PT-5 "Mechanisms (e.g., failsafe, load balancing, hot swap) are implemented to achieve resilience requirements in normal and adverse situations."
@@ -27,6 +34,76 @@ Ensure that Elastic Load Balancing has deletion protection enabled.
 Use this feature to prevent your load balancer from being accidentally or maliciously deleted, which can lead to loss of availability for your applications.
 """
 
+"""
+Demo ALB Access Log Bucket
+"""
+demo_alb_access_logs = None
+demo_alb_dependencies = []
+
+if alb_access_logs_enabled:
+    # Creates a private bucket for the ALB access logs; its logs are deleted with it when the stack is destroyed:
+    demo_alb_log_bucket = s3.BucketV2("demo-alb-log-bucket",
+        bucket_prefix="demo-alb-logs-",
+        force_destroy=True,
+        tags={**general_tags, "Name": "demo-alb-log-bucket"}
+    )
+    demo_alb_log_bucket_public_access_block = s3.BucketPublicAccessBlock("demo-alb-log-bucket-public-access-block",
+        bucket=demo_alb_log_bucket.id,
+        block_public_acls=True,
+        block_public_policy=True,
+        ignore_public_acls=True,
+        restrict_public_buckets=True,
+        opts=pulumi.ResourceOptions(parent=demo_alb_log_bucket)
+    )
+    # ALB log delivery only supports SSE-S3 encryption:
+    demo_alb_log_bucket_encryption = s3.BucketServerSideEncryptionConfigurationV2("demo-alb-log-bucket-encryption",
+        bucket=demo_alb_log_bucket.id,
+        rules=[s3.BucketServerSideEncryptionConfigurationV2RuleArgs(
+            apply_server_side_encryption_by_default=s3.BucketServerSideEncryptionConfigurationV2RuleApplyServerSideEncryptionByDefaultArgs(
+                sse_algorithm="AES256"
+            )
+        )],
+        opts=pulumi.ResourceOptions(parent=demo_alb_log_bucket)
+    )
+    # Expires log objects after alb_access_logs_expiration_days:
+    demo_alb_log_bucket_lifecycle = s3.BucketLifecycleConfigurationV2("demo-alb-log-bucket-lifecycle",
+        bucket=demo_alb_log_bucket.id,
+        rules=[s3.BucketLifecycleConfigurationV2RuleArgs(
+            id="expire-access-logs",
+            status="Enabled",
+            filter=s3.BucketLifecycleConfigurationV2RuleFilterArgs(prefix=f"{alb_access_logs_prefix}/"),
+            expiration=s3.BucketLifecycleConfigurationV2RuleExpirationArgs(days=alb_access_logs_expiration_days),
+            abort_incomplete_multipart_upload=s3.BucketLifecycleConfigurationV2RuleAbortIncompleteMultipartUploadArgs(
+                days_after_initiation=1
+            )
+        )],
+        opts=pulumi.ResourceOptions(parent=demo_alb_log_bucket)
+    )
+    # Allows the regional Elastic Load Balancing account to write under the log prefix:
+    demo_elb_service_account = elb.get_service_account_output()
+    demo_alb_log_bucket_policy = s3.BucketPolicy("demo-alb-log-bucket-policy",
+        bucket=demo_alb_log_bucket.id,
+        policy=pulumi.Output.all(demo_alb_log_bucket.arn, demo_elb_service_account.arn).apply(
+            lambda args: json.dumps({
+                "Version": "2012-10-17",
+                "Statement": [{
+                    "Effect": "Allow",
+                    "Principal": {"AWS": args[1]},
+                    "Action": "s3:PutObject",
+                    "Resource": f"{args[0]}/{alb_access_logs_prefix}/*"
+                }]
+            })
+        ),
+        opts=pulumi.ResourceOptions(parent=demo_alb_log_bucket, depends_on=[demo_alb_log_bucket_public_access_block])
+    )
+    demo_alb_access_logs = lb.LoadBalancerAccessLogsArgs(
+        bucket=demo_alb_log_bucket.id,
+        prefix=alb_access_logs_prefix,
+        enabled=True
+    )
+    # AWS validates write access when logging is enabled, so the policy has to exist first:
+    demo_alb_dependencies = [demo_alb_log_bucket_policy]
+
 """
 Demo AWS Application Load Balancer
 """
@@ -40,7 +117,13 @@ demo_sg_alb = ec2.SecurityGroup("demo-alb-security-group",
         to_port=80,
         protocol="tcp",
         cidr_blocks=["0.0.0.0/0"]
-    )],
+    )] + ([ec2.SecurityGroupIngressArgs(
+        description="Allow HTTPS from WAN",
+        from_port=443,
+        to_port=443,
+        protocol="tcp",
+        cidr_blocks=["0.0.0.0/0"]
+    )] if alb_https_enabled else []),
     egress=[ec2.SecurityGroupEgressArgs(
         from_port=0,
         to_port=0,
@@ -56,9 +139,13 @@ demo_alb = lb.LoadBalancer("demo-pub-alb",
     load_balancer_type="application",
     security_groups=[demo_sg_alb.id],
     subnets=demo_public_subnets,
+    enable_http2=alb_http2_enabled,
+    idle_timeout=alb_idle_timeout,
     enable_cross_zone_load_balancing=True, # <-------------PR.PT-5 Control (Cross-zone Load Balancing)
-    enable_deletion_protection=True, # <------------------ PR.PT-5 Control (ALB Deletion Protection)
-    tags={**general_tags, "Name": "demo-public-alb"}
+    enable_deletion_protection=alb_deletion_protection_enabled, # <-- PR.PT-5 Control (ALB Deletion Protection)
+    access_logs=demo_alb_access_logs,
+    tags={**general_tags, "Name": "demo-public-alb"},
+    opts=pulumi.ResourceOptions(depends_on=demo_alb_dependencies)
 )
 
 # Creates an Application Load Balancer Target Group:
@@ -66,26 +153,71 @@ demo_target_group = lb.TargetGroup("demo-target-group",
     port=80,
     protocol="HTTP",
     vpc_id=demo_vpc.id,
+    load_balancing_algorithm_type=alb_target_group_algorithm,
+    slow_start=alb_target_group_slow_start,
+    deregistration_delay=alb_target_group_deregistration_delay,
+    stickiness=lb.TargetGroupStickinessArgs(
+        enabled=alb_target_group_stickiness_enabled,
+        type="lb_cookie",
+        cookie_duration=alb_target_group_stickiness_duration
+    ),
     tags={**general_tags, "Name": "demo-alb-target-group"},
     health_check=lb.TargetGroupHealthCheckArgs(
         enabled=True, # <--------------------------------- PR.PT-5 Control (Healthchecks Enabled)
-        healthy_threshold=3,
-        interval=6,
+        healthy_threshold=alb_health_check_healthy_threshold,
+        unhealthy_threshold=alb_health_check_unhealthy_threshold,
+        interval=alb_health_check_interval,
+        timeout=alb_health_check_timeout,
         protocol="HTTP",
         port=nginx_stub_status_port,
-        path=f"/{nginx_stub_statuc_path}"
+        path=alb_health_check_path,
+        matcher="200"
     ),
     opts=pulumi.ResourceOptions(parent=demo_alb)
 )
 
-# Creates a listener for the Application Load Balancer:
+# Forwards to the web servers by default, unless CloudFront fronts the ALB; then only its origin-verified requests are forwarded:
+demo_forwarding_default_action = lb.ListenerDefaultActionArgs(
+    type="fixed-response",
+    fixed_response=lb.ListenerDefaultActionFixedResponseArgs(
+        content_type="text/plain",
+        message_body="Forbidden",
+        status_code="403"
+    )
+) if cdn_enabled else lb.ListenerDefaultActionArgs(
+    type="forward",
+    target_group_arn=demo_target_group.arn,
+)
+
+# Creates a listener for the Application Load Balancer, redirecting to HTTPS when a certificate is configured:
 demo_listener = lb.Listener("demo-pub-alb-listener",
     load_balancer_arn=demo_alb.arn,
     port=80,
     protocol="HTTP",
     default_actions=[lb.ListenerDefaultActionArgs(
-        type="forward",
-        target_group_arn=demo_target_group.arn,
-    )],
+        type="redirect",
+        redirect=lb.ListenerDefaultActionRedirectArgs(
+            port="443",
+            protocol="HTTPS",
+            status_code="HTTP_301"
+        )
+    ) if alb_https_enabled else demo_forwarding_default_action],
     opts=pulumi.ResourceOptions(parent=demo_alb)
-)
\ No newline at end of file
+)
+
+# The listener that forwards requests to the web servers:
+demo_forwarding_listener = demo_listener
+
+if alb_https_enabled:
+    # Creates an HTTPS listener for the Application Load Balancer:
+    demo_https_listener = lb.Listener("demo-pub-alb-https-listener",
+        load_balancer_arn=demo_alb.arn,
+        port=443,
+        protocol="HTTPS",
+        ssl_policy=alb_ssl_policy,
+        certificate_arn=alb_certificate_arn,
+        default_actions=[demo_forwarding_default_action],
+        opts=pulumi.ResourceOptions(parent=demo_alb)
+    )
+
+    demo_forwarding_listener = demo_https_listener
\ No newline at end of file
@@ -1,11 +1,29 @@
 import json
-from pulumi_aws import ec2, iam, autoscaling, config
-from pulumi import ResourceOptions
+from pulumi_aws import ec2, iam, ssm, cloudwatch, autoscaling, config
+from pulumi import ResourceOptions, Output
 
 from user_data import demo_webserver_user_data_b64
-from settings import ssh_key_name, general_tags, cluster_name, nginx_stub_status_port
-from vpc import demo_private_subnets, demo_s3_endpoint, demo_sg_s3_endpoint, demo_vpc
-from alb import demo_target_group, demo_sg_alb
+from webserver_image import demo_webserver_image_id
+from settings import (ssh_key_name, webserver_instance_type, general_tags, cluster_name, nginx_stub_status_port,
+    autoscaling_min_size, autoscaling_max_size, autoscaling_default_cooldown, autoscaling_protect_from_scale_in, autoscaling_enabled_metrics,
+    autoscaling_estimated_instance_warmup, autoscaling_scale_in_disabled, autoscaling_request_count_per_target,
+    autoscaling_cpu_utilization_target, autoscaling_nginx_connections_scaling_enabled, autoscaling_active_connections_per_instance,
+    nginx_metrics_namespace, nginx_metrics_name, webserver_root_device_name, webserver_root_volume_size,
+    webserver_hibernation_enabled, autoscaling_warm_pool_enabled, autoscaling_warm_pool_state, autoscaling_warm_pool_min_size,
+    autoscaling_warm_pool_max_group_prepared_capacity, autoscaling_warm_pool_reuse_on_scale_in,
+    autoscaling_launch_lifecycle_hook_name, autoscaling_launch_lifecycle_hook_timeout, autoscaling_mixed_instances_enabled,
+    autoscaling_mixed_instance_types, autoscaling_on_demand_base_capacity, autoscaling_on_demand_percentage_above_base_capacity,
+    autoscaling_spot_allocation_strategy, autoscaling_capacity_rebalance, autoscaling_health_check_type,
+    autoscaling_health_check_grace_period, autoscaling_instance_refresh_triggers, autoscaling_default_instance_warmup,
+    autoscaling_instance_refresh_min_healthy_percentage, autoscaling_instance_refresh_instance_warmup,
+    autoscaling_instance_refresh_skip_matching, autoscaling_instance_refresh_auto_rollback,
+    autoscaling_instance_refresh_checkpoint_percentages, autoscaling_instance_refresh_checkpoint_delay,
+    autoscaling_instance_refresh_rollback_alarms_enabled, webserver_root_volume_type, webserver_root_volume_iops,
+    webserver_root_volume_throughput, webserver_cpu_credits, webserver_detailed_monitoring, webserver_metadata_http_tokens,
+    webserver_metadata_hop_limit)
+from vpc import demo_private_subnets, demo_s3_endpoint, demo_s3_endpoint_dependencies, demo_vpc
+from alb import demo_alb, demo_target_group, demo_sg_alb
+from monitoring import demo_instance_refresh_rollback_alarms
 
 """
 PR.PT-3 "The principle of least functionality is incorporated by configuring systems to provide only essential capabilities"
@@ -25,29 +43,6 @@ Amazon EC2 instances can contain sensitive information and access control is req
 """
 EC2 Configuration: Launch Template, Autoscaling Group and Security Group
 """
-# Fetch an Amazon Linux 2 AMI
-demo_ami = ec2.get_ami(most_recent=True,
-    filters=[
-        ec2.GetAmiFilterArgs(
-            name="name",
-            values=["amzn2-ami-kernel-5.10-*"],
-        ),
-        ec2.GetAmiFilterArgs(
-            name="virtualization-type",
-            values=["hvm"],
-        ),
-        ec2.GetAmiFilterArgs(
-            name="root-device-type",
-            values=["ebs"],
-        ),
-        ec2.GetAmiFilterArgs(
-            name="architecture",
-            values=["x86_64"]
-        )
-    ],
-    owners=["amazon"]
-)
-
 # Create a least-privilege IAM role to allow fetching configuration from SSM Parameter Store:
 aws_managed_instance_profile_policy_arns = [
     "arn:aws:iam::aws:policy/CloudWatchAgentServerPolicy",
@@ -76,6 +71,20 @@ for i, policy_arn in enumerate(aws_managed_instance_profile_policy_arns):
     ),
     opts=ResourceOptions(parent=demo_instance_role)
 
+# Allows web servers to signal the launch lifecycle hook of their own autoscaling group:
+demo_instance_lifecycle_policy = iam.RolePolicy("demo-instance-lifecycle-policy",
+    role=demo_instance_role.id,
+    policy=json.dumps({
+        "Version": "2012-10-17",
+        "Statement": [{
+            "Action": "autoscaling:CompleteLifecycleAction",
+            "Effect": "Allow",
+            "Resource": f"arn:aws:autoscaling:{config.region}:*:autoScalingGroup:*:autoScalingGroupName/{cluster_name}"
+        }],
+    }),
+    opts=ResourceOptions(parent=demo_instance_role)
+)
+
 # Creates a list-privilege instance profile:
 demo_instance_profile = iam.InstanceProfile("demo-instance-profile", role=demo_instance_role.name)
 
@@ -115,17 +124,42 @@ sgr_webserver_egress = ec2.SecurityGroupRule("sgr-webserver-egress",
 # Creates an autoscaling group launch template:
 demo_launch_template = ec2.LaunchTemplate("demo-launch-template",
     key_name=ssh_key_name,
-    instance_type="t3.small",
+    instance_type=webserver_instance_type,
     iam_instance_profile=ec2.LaunchTemplateIamInstanceProfileArgs(
         name=demo_instance_profile.name # <------------------------ PR.PT-3 Control (EC2 Instance profile is attached)
     ),
-    image_id=demo_ami.image_id,
+    image_id=demo_webserver_image_id,
     network_interfaces=[ec2.LaunchTemplateNetworkInterfaceArgs(
         associate_public_ip_address="false", # <------------------- PR.PT-3 Control (EC2 Instance has no public IP)
         security_groups=[demo_sg_webserver.id]
     )],
     tags={**general_tags, "Name": "demo-launch-template"},
     user_data=demo_webserver_user_data_b64,
+    hibernation_options=ec2.LaunchTemplateHibernationOptionsArgs(
+        configured=True
+    ) if webserver_hibernation_enabled else None,
+    block_device_mappings=[ec2.LaunchTemplateBlockDeviceMappingArgs(
+        device_name=webserver_root_device_name,
+        ebs=ec2.LaunchTemplateBlockDeviceMappingEbsArgs(
+            encrypted="true" if webserver_hibernation_enabled else None,
+            volume_size=webserver_root_volume_size,
+            volume_type=webserver_root_volume_type,
+            iops=webserver_root_volume_iops if webserver_root_volume_type in ("gp3", "io1", "io2") else None,
+            throughput=webserver_root_volume_throughput if webserver_root_volume_type == "gp3" else None,
+            delete_on_termination="true"
+        )
+    )],
+    credit_specification=ec2.LaunchTemplateCreditSpecificationArgs(
+        cpu_credits=webserver_cpu_credits
+    ) if webserver_cpu_credits else None,
+    monitoring=ec2.LaunchTemplateMonitoringArgs(
+        enabled=webserver_detailed_monitoring
+    ),
+    metadata_options=ec2.LaunchTemplateMetadataOptionsArgs(
+        http_endpoint="enabled",
+        http_tokens=webserver_metadata_http_tokens,
+        http_put_response_hop_limit=webserver_metadata_hop_limit
+    ),
     update_default_version=True,
     tag_specifications=[ec2.LaunchTemplateTagSpecificationArgs(
         resource_type="instance",
@@ -136,22 +170,56 @@ demo_launch_template = ec2.LaunchTemplate("demo-launch-template",
 
 # Creates an autoscaling group:
 demo_autoscaling_group = autoscaling.Group("demo-autoscaling-group",
-    max_size=4,
-    min_size=4,
+    max_size=autoscaling_max_size,
+    min_size=autoscaling_min_size,
+    default_cooldown=autoscaling_default_cooldown,
+    health_check_type=autoscaling_health_check_type, # <----------- PR.PT-5 Control (ELB Health Checks)
+    health_check_grace_period=autoscaling_health_check_grace_period,
+    protect_from_scale_in=autoscaling_protect_from_scale_in,
     name=cluster_name,
-    enabled_metrics=["GroupMinSize","GroupMaxSize","GroupDesiredCapacity","GroupInServiceInstances","GroupPendingInstances","GroupStandbyInstances","GroupTerminatingInstances","GroupTotalInstances"],
+    enabled_metrics=autoscaling_enabled_metrics,
     vpc_zone_identifiers=demo_private_subnets,
     launch_template=autoscaling.GroupLaunchTemplateArgs(
         id=demo_launch_template.id,
         version=demo_launch_template.latest_version
-    ),
-    default_instance_warmup=2,
+    ) if not autoscaling_mixed_instances_enabled else None,
+    mixed_instances_policy=autoscaling.GroupMixedInstancesPolicyArgs(
+        instances_distribution=autoscaling.GroupMixedInstancesPolicyInstancesDistributionArgs(
+            on_demand_base_capacity=autoscaling_on_demand_base_capacity,
+            on_demand_percentage_above_base_capacity=autoscaling_on_demand_percentage_above_base_capacity,
+            spot_allocation_strategy=autoscaling_spot_allocation_strategy
+        ),
+        launch_template=autoscaling.GroupMixedInstancesPolicyLaunchTemplateArgs(
+            launch_template_specification=autoscaling.GroupMixedInstancesPolicyLaunchTemplateLaunchTemplateSpecificationArgs(
+                launch_template_id=demo_launch_template.id,
+                version=demo_launch_template.latest_version
+            ),
+            overrides=[autoscaling.GroupMixedInstancesPolicyLaunchTemplateOverrideArgs(
+                instance_type=instance_type
+            ) for instance_type in dict.fromkeys(autoscaling_mixed_instance_types)]
+        )
+    ) if autoscaling_mixed_instances_enabled else None,
+    capacity_rebalance=autoscaling_capacity_rebalance if autoscaling_mixed_instances_enabled else None,
+    default_instance_warmup=autoscaling_default_instance_warmup,
+    warm_pool=autoscaling.GroupWarmPoolArgs(
+        pool_state=autoscaling_warm_pool_state,
+        min_size=autoscaling_warm_pool_min_size,
+        max_group_prepared_capacity=autoscaling_warm_pool_max_group_prepared_capacity,
+        instance_reuse_policy=autoscaling.GroupWarmPoolInstanceReusePolicyArgs(
+            reuse_on_scale_in=autoscaling_warm_pool_reuse_on_scale_in
+        )
+    ) if autoscaling_warm_pool_enabled else None,
     instance_refresh=autoscaling.GroupInstanceRefreshArgs(
         strategy="Rolling",
         preferences=autoscaling.GroupInstanceRefreshPreferencesArgs(
-            min_healthy_percentage=50
+            min_healthy_percentage=autoscaling_instance_refresh_min_healthy_percentage,
+            instance_warmup=str(autoscaling_instance_refresh_instance_warmup),
+            checkpoint_percentages=autoscaling_instance_refresh_checkpoint_percentages or None,
+            checkpoint_delay=str(autoscaling_instance_refresh_checkpoint_delay) if autoscaling_instance_refresh_checkpoint_percentages else None,
+            skip_matching=autoscaling_instance_refresh_skip_matching,
+            auto_rollback=autoscaling_instance_refresh_auto_rollback
         ),
-        triggers=["tag"],
+        triggers=autoscaling_instance_refresh_triggers,
     ),
     tags=[autoscaling.GroupTagArgs(
         key="Name",
@@ -160,12 +228,226 @@ demo_autoscaling_group = autoscaling.Group("demo-autoscaling-group",
     )],
     opts=ResourceOptions(
         ignore_changes=["target_group_arns"],
-        depends_on=[demo_vpc, demo_s3_endpoint, demo_sg_s3_endpoint]
+        depends_on=[demo_vpc, *demo_s3_endpoint_dependencies]
     )
 )
 
+# Creates the launch lifecycle hook as its own resource, since hooks on the group itself only apply when it is created:
+demo_launch_lifecycle_hook = autoscaling.LifecycleHook("demo-launch-lifecycle-hook",
+    name=autoscaling_launch_lifecycle_hook_name,
+    autoscaling_group_name=demo_autoscaling_group.name,
+    lifecycle_transition="autoscaling:EC2_INSTANCE_LAUNCHING",
+    default_result="ABANDON",
+    heartbeat_timeout=autoscaling_launch_lifecycle_hook_timeout,
+    opts=ResourceOptions(parent=demo_autoscaling_group)
+)
+
 # Creates an autoscaling group to ALB target group attachment:
 demo_autoscaling_group_attachment = autoscaling.Attachment("demo-autoscaling-attachment",
-    autoscaling_group_name=demo_autoscaling_group,
+    autoscaling_group_name=demo_autoscaling_group.name,
     lb_target_group_arn=demo_target_group.arn
-)
\ No newline at end of file
+)
+
+"""
+Instance Refresh Rollback: an alarm during a refresh restores the previous launch template version
+"""
+if autoscaling_instance_refresh_rollback_alarms_enabled:
+    # Creates a role for EventBridge to start the rollback automation and for the automation to roll the refresh back:
+    demo_instance_refresh_rollback_role = iam.Role("demo-instance-refresh-rollback-role",
+        assume_role_policy=json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": "sts:AssumeRole",
+                "Effect": "Allow",
+                "Principal": {
+                    "Service": ["events.amazonaws.com", "ssm.amazonaws.com"],
+                },
+            }],
+        }),
+        tags={**general_tags, "Name": "demo-instance-refresh-rollback-role"}
+    )
+
+    # Creates an automation document that rolls back the active instance refresh:
+    demo_instance_refresh_rollback_document = ssm.Document("demo-instance-refresh-rollback-document",
+        name=f"{cluster_name}-RollbackInstanceRefresh",
+        document_type="Automation",
+        document_format="JSON",
+        content=json.dumps({
+            "schemaVersion": "0.3",
+            "description": "Roll back the instance refresh of an autoscaling group if one is in progress",
+            "assumeRole": "{{ AutomationAssumeRole }}",
+            "parameters": {
+                "AutoScalingGroupName": {"type": "String"},
+                "AutomationAssumeRole": {"type": "String"}
+            },
+            # Alarms also fire outside refreshes, so the rollback only runs while the latest refresh is still active:
+            "mainSteps": [{
+                "name": "describeInstanceRefresh",
+                "action": "aws:executeAwsApi",
+                "isCritical": False,
+                "onFailure": "step:noActiveInstanceRefresh",
+                "inputs": {
+                    "Service": "autoscaling",
+                    "Api": "DescribeInstanceRefreshes",
+                    "AutoScalingGroupName": "{{ AutoScalingGroupName }}",
+                    "MaxRecords": 1
+                },
+                "outputs": [{
+                    "Name": "Status",
+                    "Selector": "$.InstanceRefreshes[0].Status",
+                    "Type": "String"
+                }]
+            }, {
+                "name": "checkInstanceRefreshActive",
+                "action": "aws:branch",
+                "inputs": {
+                    "Choices": [{
+                        "Or": [{"Variable": "{{ describeInstanceRefresh.Status }}", "StringEquals": status}
+                               for status in ("Pending", "InProgress", "Baking")],
+                        "NextStep": "rollbackInstanceRefresh"
+                    }],
+                    "Default": "noActiveInstanceRefresh"
+                }
+            }, {
+                "name": "rollbackInstanceRefresh",
+                "action": "aws:executeAwsApi",
+                "isEnd": True,
+                "inputs": {
+                    "Service": "autoscaling",
+                    "Api": "RollbackInstanceRefresh",
+                    "AutoScalingGroupName": "{{ AutoScalingGroupName }}"
+                }
+            }, {
+                "name": "noActiveInstanceRefresh",
+                "action": "aws:sleep",
+                "isEnd": True,
+                "inputs": {"Duration": "PT0S"}
+            }]
+        }),
+        tags={**general_tags, "Name": "demo-instance-refresh-rollback-document"}
+    )
+    demo_instance_refresh_rollback_automation_arn = demo_instance_refresh_rollback_document.arn.apply(
+        lambda arn: arn.replace(":document/", ":automation-definition/") + ":$DEFAULT"
+    )
+
+    # Rollback relaunches instances from the previous launch template version, so it needs the launch permissions too:
+    demo_instance_refresh_rollback_policy = iam.RolePolicy("demo-instance-refresh-rollback-policy",
+        role=demo_instance_refresh_rollback_role.id,
+        policy=Output.all(demo_instance_refresh_rollback_automation_arn, demo_instance_refresh_rollback_role.arn,
+                          demo_instance_role.arn).apply(lambda args: json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": "ssm:StartAutomationExecution",
+                "Effect": "Allow",
+                "Resource": args[0]
+            }, {
+                "Action": "autoscaling:RollbackInstanceRefresh",
+                "Effect": "Allow",
+                "Resource": f"arn:aws:autoscaling:{config.region}:*:autoScalingGroup:*:autoScalingGroupName/{cluster_name}"
+            }, {
+                "Action": ["autoscaling:DescribeInstanceRefreshes", "ec2:RunInstances", "ec2:CreateTags",
+                           "ec2:DescribeLaunchTemplateVersions"],
+                "Effect": "Allow",
+                "Resource": "*"
+            }, {
+                "Action": "iam:PassRole",
+                "Effect": "Allow",
+                "Resource": [args[1], args[2]]
+            }],
+        })),
+        opts=ResourceOptions(parent=demo_instance_refresh_rollback_role)
+    )
+
+    # Starts the rollback automation whenever one of the rollback alarms enters the ALARM state; the automation itself
+    # ends without a rollback when no refresh is in progress:
+    demo_instance_refresh_rollback_rule = cloudwatch.EventRule("demo-instance-refresh-rollback-rule",
+        description="Roll back the web server instance refresh when a rollback alarm fires",
+        event_pattern=Output.all(*[alarm.arn for alarm in demo_instance_refresh_rollback_alarms]).apply(
+            lambda alarm_arns: json.dumps({
+                "source": ["aws.cloudwatch"],
+                "detail-type": ["CloudWatch Alarm State Change"],
+                "resources": alarm_arns,
+                "detail": {"state": {"value": ["ALARM"]}}
+            })
+        ),
+        tags={**general_tags, "Name": "demo-instance-refresh-rollback-rule"}
+    )
+    demo_instance_refresh_rollback_target = cloudwatch.EventTarget("demo-instance-refresh-rollback-target",
+        rule=demo_instance_refresh_rollback_rule.name,
+        arn=demo_instance_refresh_rollback_automation_arn,
+        role_arn=demo_instance_refresh_rollback_role.arn,
+        input=demo_instance_refresh_rollback_role.arn.apply(lambda role_arn: json.dumps({
+            "AutoScalingGroupName": [cluster_name],
+            "AutomationAssumeRole": [role_arn]
+        })),
+        opts=ResourceOptions(parent=demo_instance_refresh_rollback_rule, depends_on=[demo_instance_refresh_rollback_policy])
+    )
+
+"""
+Autoscaling Policies: target tracking on ALB request count per target and average CPU utilization
+"""
+# Creates a target tracking policy on ALB requests per target:
+demo_request_count_scaling_policy = autoscaling.Policy("demo-request-count-scaling-policy",
+    autoscaling_group_name=demo_autoscaling_group.name,
+    policy_type="TargetTrackingScaling",
+    estimated_instance_warmup=autoscaling_estimated_instance_warmup,
+    target_tracking_configuration=autoscaling.PolicyTargetTrackingConfigurationArgs(
+        predefined_metric_specification=autoscaling.PolicyTargetTrackingConfigurationPredefinedMetricSpecificationArgs(
+            predefined_metric_type="ALBRequestCountPerTarget",
+            resource_label=Output.concat(demo_alb.arn_suffix, "/", demo_target_group.arn_suffix)
+        ),
+        target_value=autoscaling_request_count_per_target,
+        disable_scale_in=autoscaling_scale_in_disabled
+    ),
+    opts=ResourceOptions(
+        parent=demo_autoscaling_group,
+        depends_on=[demo_autoscaling_group_attachment]
+    )
+)
+
+# Creates a target tracking policy on average CPU utilization:
+demo_cpu_scaling_policy = autoscaling.Policy("demo-cpu-scaling-policy",
+    autoscaling_group_name=demo_autoscaling_group.name,
+    policy_type="TargetTrackingScaling",
+    estimated_instance_warmup=autoscaling_estimated_instance_warmup,
+    target_tracking_configuration=autoscaling.PolicyTargetTrackingConfigurationArgs(
+        predefined_metric_specification=autoscaling.PolicyTargetTrackingConfigurationPredefinedMetricSpecificationArgs(
+            predefined_metric_type="ASGAverageCPUUtilization"
+        ),
+        target_value=autoscaling_cpu_utilization_target,
+        disable_scale_in=autoscaling_scale_in_disabled
+    ),
+    opts=ResourceOptions(parent=demo_autoscaling_group)
+)
+
+# Creates an optional target tracking policy on average active Nginx connections per instance:
+if autoscaling_nginx_connections_scaling_enabled:
+    demo_nginx_connections_scaling_policy = autoscaling.Policy("demo-nginx-connections-scaling-policy",
+        autoscaling_group_name=demo_autoscaling_group.name,
+        policy_type="TargetTrackingScaling",
+        estimated_instance_warmup=autoscaling_estimated_instance_warmup,
+        target_tracking_configuration=autoscaling.PolicyTargetTrackingConfigurationArgs(
+            customized_metric_specification=autoscaling.PolicyTargetTrackingConfigurationCustomizedMetricSpecificationArgs(
+                namespace=nginx_metrics_namespace,
+                metric_name=nginx_metrics_name,
+                statistic="Average",
+                metric_dimensions=[
+                    autoscaling.PolicyTargetTrackingConfigurationCustomizedMetricSpecificationMetricDimensionArgs(
+                        name="AutoScalingGroupName",
+                        value=cluster_name
+                    ),
+                    autoscaling.PolicyTargetTrackingConfigurationCustomizedMetricSpecificationMetricDimensionArgs(
+                        name="type",
+                        value="nginx_connections"
+                    ),
+                    autoscaling.PolicyTargetTrackingConfigurationCustomizedMetricSpecificationMetricDimensionArgs(
+                        name="type_instance",
+                        value="active"
+                    )
+                ]
+            ),
+            target_value=autoscaling_active_connections_per_instance,
+            disable_scale_in=autoscaling_scale_in_disabled
+        ),
+        opts=ResourceOptions(parent=demo_autoscaling_group)
+    )
\ No newline at end of file
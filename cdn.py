@@ -0,0 +1,114 @@
+import re
+import pulumi
+from pulumi_aws import cloudfront, lb, config
+from settings import (general_tags, cluster_name, cdn_enabled, cdn_price_class, cdn_origin_domain,
+    cdn_origin_keepalive_timeout, cdn_origin_read_timeout, cdn_origin_verify_header, cdn_origin_verify_secret,
+    cdn_default_cache_behavior, cdn_ordered_cache_behaviors, cdn_origin_request_policy_id)
+from alb import demo_target_group, demo_forwarding_listener
+
+"""
+Demo CloudFront Distribution: caches responses at the edge in front of the Application Load Balancer
+"""
+demo_cdn_origin_id = "demo-alb-origin"
+
+# Creates a cache policy with compression enabled for a cache behaviour; cache policy names are global, so they carry the region:
+def cdn_cache_policy(policy_name, behavior):
+    return cloudfront.CachePolicy(f"demo-cdn-cache-policy-{policy_name}",
+        name=f"{cluster_name}-{config.region}-{policy_name}",
+        min_ttl=behavior["min_ttl"],
+        default_ttl=behavior["default_ttl"],
+        max_ttl=behavior["max_ttl"],
+        parameters_in_cache_key_and_forwarded_to_origin=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginArgs(
+            enable_accept_encoding_gzip=True,
+            enable_accept_encoding_brotli=True,
+            cookies_config=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginCookiesConfigArgs(
+                cookie_behavior="none"
+            ),
+            headers_config=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginHeadersConfigArgs(
+                header_behavior="whitelist" if behavior.get("headers") else "none",
+                headers=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginHeadersConfigHeadersArgs(
+                    items=behavior["headers"]
+                ) if behavior.get("headers") else None
+            ),
+            query_strings_config=cloudfront.CachePolicyParametersInCacheKeyAndForwardedToOriginQueryStringsConfigArgs(
+                query_string_behavior="all"
+            )
+        )
+    )
+
+if cdn_enabled:
+    # Forwards only requests carrying the origin verification header; everything else hits the 403 default action:
+    demo_cdn_origin_verify_rule = lb.ListenerRule("demo-cdn-origin-verify-rule",
+        listener_arn=demo_forwarding_listener.arn,
+        priority=1,
+        conditions=[lb.ListenerRuleConditionArgs(
+            http_header=lb.ListenerRuleConditionHttpHeaderArgs(
+                http_header_name=cdn_origin_verify_header,
+                values=[cdn_origin_verify_secret]
+            )
+        )],
+        actions=[lb.ListenerRuleActionArgs(
+            type="forward",
+            target_group_arn=demo_target_group.arn
+        )],
+        opts=pulumi.ResourceOptions(parent=demo_forwarding_listener)
+    )
+
+    # Creates cache policies for the default and path-specific behaviours:
+    demo_cdn_default_cache_policy = cdn_cache_policy("default", cdn_default_cache_behavior)
+    demo_cdn_ordered_cache_policies = [
+        cdn_cache_policy(re.sub(r"[^a-zA-Z0-9]+", "-", behavior["path_pattern"]).strip("-"), behavior)
+        for behavior in cdn_ordered_cache_behaviors
+    ]
+
+    # Creates a CloudFront distribution with the ALB as its origin:
+    demo_cdn = cloudfront.Distribution("demo-cdn",
+        enabled=True,
+        is_ipv6_enabled=True,
+        http_version="http2and3",
+        price_class=cdn_price_class,
+        origins=[cloudfront.DistributionOriginArgs(
+            origin_id=demo_cdn_origin_id,
+            domain_name=cdn_origin_domain,
+            custom_origin_config=cloudfront.DistributionOriginCustomOriginConfigArgs(
+                http_port=80,
+                https_port=443,
+                origin_protocol_policy="https-only",
+                origin_ssl_protocols=["TLSv1.2"],
+                origin_keepalive_timeout=cdn_origin_keepalive_timeout,
+                origin_read_timeout=cdn_origin_read_timeout
+            ),
+            custom_headers=[cloudfront.DistributionOriginCustomHeaderArgs(
+                name=cdn_origin_verify_header,
+                value=cdn_origin_verify_secret
+            )]
+        )],
+        default_cache_behavior=cloudfront.DistributionDefaultCacheBehaviorArgs(
+            target_origin_id=demo_cdn_origin_id,
+            viewer_protocol_policy="redirect-to-https",
+            allowed_methods=["GET", "HEAD", "OPTIONS", "PUT", "POST", "PATCH", "DELETE"],
+            cached_methods=["GET", "HEAD"],
+            compress=True,
+            cache_policy_id=demo_cdn_default_cache_policy.id,
+            origin_request_policy_id=cdn_origin_request_policy_id
+        ),
+        ordered_cache_behaviors=[cloudfront.DistributionOrderedCacheBehaviorArgs(
+            path_pattern=behavior["path_pattern"],
+            target_origin_id=demo_cdn_origin_id,
+            viewer_protocol_policy="redirect-to-https",
+            allowed_methods=["GET", "HEAD", "OPTIONS"],
+            cached_methods=["GET", "HEAD"],
+            compress=True,
+            cache_policy_id=cache_policy.id
+        ) for behavior, cache_policy in zip(cdn_ordered_cache_behaviors, demo_cdn_ordered_cache_policies)],
+        restrictions=cloudfront.DistributionRestrictionsArgs(
+            geo_restriction=cloudfront.DistributionRestrictionsGeoRestrictionArgs(
+                restriction_type="none"
+            )
+        ),
+        viewer_certificate=cloudfront.DistributionViewerCertificateArgs(
+            cloudfront_default_certificate=True
+        ),
+        tags={**general_tags, "Name": "demo-cdn"},
+        opts=pulumi.ResourceOptions(depends_on=[demo_cdn_origin_verify_rule])
+    )
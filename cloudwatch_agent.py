@@ -0,0 +1,79 @@
+import json
+from jinja2 import Template
+from pulumi_aws import ssm
+from settings import (general_tags, nginx_stub_status_port, nginx_stub_statuc_path, cloudwatch_agent_config_parameter_path,
+    collectd_config_parameter_path, collectd_network_port, nginx_metrics_namespace, nginx_metrics_collection_interval)
+
+"""
+Configures collectd to scrape the Nginx stub_status page and forward the readings to the local CloudWatch agent:
+"""
+# Creates a collectd configuration file template:
+demo_collectd_configuration_file = Template("""
+Interval {{ interval }}
+
+LoadPlugin nginx
+LoadPlugin network
+
+<Plugin nginx>
+        URL "http://127.0.0.1:{{ port }}/{{ path }}"
+</Plugin>
+
+<Plugin network>
+        Server "127.0.0.1" "{{ network_port }}"
+</Plugin>
+""")
+
+# Renders demo_collectd_configuration_file template:
+demo_collectd_configuration = demo_collectd_configuration_file.render(
+    interval=nginx_metrics_collection_interval,
+    port=nginx_stub_status_port,
+    path=nginx_stub_statuc_path,
+    network_port=collectd_network_port
+)
+
+# Creates an SSM Parameter for the collectd configuration:
+demo_collectd_configuration_parameter = ssm.Parameter("demo-collectd-config",
+    type="String",
+    data_type="text",
+    name=collectd_config_parameter_path,
+    tags={**general_tags, "Name": "demo-collectd-config"},
+    value=demo_collectd_configuration
+)
+
+"""
+Configures the CloudWatch agent to publish Nginx connection and request metrics per instance and per autoscaling group:
+"""
+# Active, reading, writing and waiting connections arrive as type_instance values of the nginx_connections type,
+# requests as the nginx_requests type. The AutoScalingGroupName rollup is the fleet-wide per-instance average.
+demo_cloudwatch_agent_configuration = json.dumps({
+    "agent": {
+        "metrics_collection_interval": nginx_metrics_collection_interval,
+        "omit_hostname": True
+    },
+    "metrics": {
+        "namespace": nginx_metrics_namespace,
+        "append_dimensions": {
+            "AutoScalingGroupName": "${aws:AutoScalingGroupName}",
+            "InstanceId": "${aws:InstanceId}"
+        },
+        "aggregation_dimensions": [
+            ["AutoScalingGroupName", "type", "type_instance"]
+        ],
+        "metrics_collected": {
+            "collectd": {
+                "service_address": f"udp://127.0.0.1:{collectd_network_port}",
+                "collectd_security_level": "none",
+                "metrics_aggregation_interval": nginx_metrics_collection_interval
+            }
+        }
+    }
+}, indent=2)
+
+# Creates an SSM Parameter for the CloudWatch agent configuration:
+demo_cloudwatch_agent_configuration_parameter = ssm.Parameter("demo-cloudwatch-agent-config",
+    type="String",
+    data_type="text",
+    name=cloudwatch_agent_config_parameter_path,
+    tags={**general_tags, "Name": "demo-cloudwatch-agent-config"},
+    value=demo_cloudwatch_agent_configuration
+)
@@ -0,0 +1,36 @@
+import json
+import os
+import time
+from settings import lookup_cache_path, lookup_cache_ttl
+
+"""
+On-disk cache for data source lookups, so previews skip repeated AWS invokes within lookup_cache_ttl seconds:
+"""
+def _load_lookup_cache(path):
+    try:
+        with open(path) as cache_file:
+            return json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+# Returns a cached lookup value, or None when it is missing or older than the TTL:
+def read_lookup_cache(key, path=lookup_cache_path, ttl=lookup_cache_ttl):
+    if ttl <= 0:
+        return None
+    entry = _load_lookup_cache(path).get(key)
+    if entry is None or time.time() - entry["resolved_at"] >= ttl:
+        return None
+    return entry["value"]
+
+# Stores a resolved lookup value and returns it unchanged, so it can be chained onto an invoke result:
+def write_lookup_cache(key, value, path=lookup_cache_path, ttl=lookup_cache_ttl):
+    if ttl <= 0:
+        return value
+    cache = _load_lookup_cache(path)
+    cache[key] = {"value": value, "resolved_at": time.time()}
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, "w") as cache_file:
+        json.dump(cache, cache_file, indent=2, sort_keys=True)
+    os.replace(temporary_path, path)
+    return value
@@ -0,0 +1,182 @@
+import json
+import pulumi
+from pulumi_aws import cloudwatch, sns, config
+from settings import (general_tags, cluster_name, demo_az_count, webserver_burstable, autoscaling_max_size,
+    autoscaling_enabled_metrics, alarm_notification_email, alarm_period, alarm_evaluation_periods, alarm_datapoints_to_alarm,
+    alarm_target_5xx_count_threshold, alarm_elb_5xx_count_threshold, alarm_target_response_time_p50_threshold,
+    alarm_target_response_time_p99_threshold, alarm_rejected_connection_count_threshold, alarm_min_healthy_hosts,
+    alarm_cpu_credit_balance_threshold, alarm_cpu_credit_balance_period, nginx_metrics_namespace, nginx_metrics_name)
+from vpc import demo_azs
+from alb import demo_alb, demo_target_group
+
+"""
+Demo CloudWatch Alarms
+"""
+# Creates a topic for alarm notifications, with an optional e-mail subscription:
+demo_alarm_topic = sns.Topic("demo-alarm-topic",
+    name=f"{cluster_name}-alarms",
+    tags={**general_tags, "Name": "demo-alarm-topic"}
+)
+if alarm_notification_email:
+    demo_alarm_email_subscription = sns.TopicSubscription("demo-alarm-email-subscription",
+        topic=demo_alarm_topic.arn,
+        protocol="email",
+        endpoint=alarm_notification_email,
+        opts=pulumi.ResourceOptions(parent=demo_alarm_topic)
+    )
+
+demo_load_balancer_dimensions = {"LoadBalancer": demo_alb.arn_suffix}
+demo_target_group_dimensions = {
+    "LoadBalancer": demo_alb.arn_suffix,
+    "TargetGroup": demo_target_group.arn_suffix
+}
+demo_autoscaling_group_dimensions = {"AutoScalingGroupName": cluster_name}
+
+# Creates an alarm notifying the alarm topic on ALARM and OK transitions:
+def metric_alarm(alarm_name, description, metric_name, dimensions, threshold, namespace="AWS/ApplicationELB",
+                 statistic="Sum", extended_statistic=None, comparison_operator="GreaterThanThreshold",
+                 treat_missing_data="notBreaching", parent=demo_target_group, resource_name=None, period=alarm_period):
+    resource_name = resource_name or f"demo-{alarm_name}-alarm"
+    return cloudwatch.MetricAlarm(resource_name,
+        name=f"{cluster_name}-{alarm_name}",
+        alarm_description=description,
+        namespace=namespace,
+        metric_name=metric_name,
+        dimensions=dimensions,
+        statistic=None if extended_statistic else statistic,
+        extended_statistic=extended_statistic,
+        period=period,
+        evaluation_periods=alarm_evaluation_periods,
+        datapoints_to_alarm=alarm_datapoints_to_alarm,
+        comparison_operator=comparison_operator,
+        threshold=threshold,
+        treat_missing_data=treat_missing_data,
+        alarm_actions=[demo_alarm_topic.arn],
+        ok_actions=[demo_alarm_topic.arn],
+        tags={**general_tags, "Name": resource_name},
+        opts=pulumi.ResourceOptions(parent=parent)
+    )
+
+demo_target_5xx_alarm = metric_alarm("target-5xx",
+    "Web servers are returning 5xx responses through the ALB",
+    "HTTPCode_Target_5XX_Count", demo_target_group_dimensions, alarm_target_5xx_count_threshold)
+demo_elb_5xx_alarm = metric_alarm("elb-5xx",
+    "The ALB is returning 5xx responses of its own, e.g. when no target is available",
+    "HTTPCode_ELB_5XX_Count", demo_load_balancer_dimensions, alarm_elb_5xx_count_threshold, parent=demo_alb)
+# Keeps the resource name and alarm name the p99 alarm was created with:
+demo_target_response_time_alarm = metric_alarm("target-response-time-p99",
+    "p99 web server response time through the ALB is above the threshold",
+    "TargetResponseTime", demo_target_group_dimensions, alarm_target_response_time_p99_threshold, extended_statistic="p99",
+    resource_name="demo-target-response-time-alarm")
+demo_target_response_time_p50_alarm = metric_alarm("target-response-time-p50",
+    "Median web server response time through the ALB is above the threshold",
+    "TargetResponseTime", demo_target_group_dimensions, alarm_target_response_time_p50_threshold, extended_statistic="p50")
+demo_rejected_connection_alarm = metric_alarm("rejected-connections",
+    "The ALB is rejecting connections because it reached its connection limit",
+    "RejectedConnectionCount", demo_load_balancer_dimensions, alarm_rejected_connection_count_threshold, parent=demo_alb)
+demo_healthy_hosts_alarm = metric_alarm("healthy-hosts",
+    "Too few web servers are passing ALB health checks",
+    "HealthyHostCount", demo_target_group_dimensions, alarm_min_healthy_hosts, statistic="Minimum",
+    comparison_operator="LessThanThreshold", treat_missing_data="breaching")
+demo_max_capacity_alarm = metric_alarm("at-max-capacity",
+    "The web server group is running at its maximum size and cannot scale out further",
+    "GroupInServiceInstances", demo_autoscaling_group_dimensions, autoscaling_max_size, namespace="AWS/AutoScaling",
+    statistic="Maximum", comparison_operator="GreaterThanOrEqualToThreshold", parent=None)
+
+# The group minimum tracks the instance closest to running out of CPU credits:
+if webserver_burstable:
+    demo_cpu_credit_balance_alarm = metric_alarm("cpu-credit-balance",
+        "A burstable web server is about to run out of CPU credits",
+        "CPUCreditBalance", demo_autoscaling_group_dimensions, alarm_cpu_credit_balance_threshold, namespace="AWS/EC2",
+        statistic="Minimum", comparison_operator="LessThanThreshold", parent=None, period=alarm_cpu_credit_balance_period)
+
+# Alarms that roll back an in-progress instance refresh:
+demo_instance_refresh_rollback_alarms = [demo_target_5xx_alarm, demo_target_response_time_alarm]
+
+"""
+Demo CloudWatch Dashboard
+"""
+# Creates a metric widget for the dashboard:
+def metric_widget(title, metrics, stat="Sum", y=0, x=0, width=12, height=6, annotations=None):
+    return {
+        "type": "metric",
+        "x": x,
+        "y": y,
+        "width": width,
+        "height": height,
+        "properties": {
+            "title": title,
+            "region": config.region,
+            "view": "timeSeries",
+            "stat": stat,
+            "period": alarm_period,
+            "metrics": metrics,
+            **({"annotations": {"horizontal": annotations}} if annotations else {})
+        }
+    }
+
+def dashboard_body(alb_suffix, target_group_suffix):
+    load_balancer = ["LoadBalancer", alb_suffix]
+    target_group = ["TargetGroup", target_group_suffix, "LoadBalancer", alb_suffix]
+    autoscaling_group = ["AutoScalingGroupName", cluster_name]
+    widgets = [
+        metric_widget("Target response time (seconds)", [
+            ["AWS/ApplicationELB", "TargetResponseTime", *target_group, {"stat": "p50", "label": "p50"}],
+            ["AWS/ApplicationELB", "TargetResponseTime", *target_group, {"stat": "p99", "label": "p99"}]
+        ], y=0, x=0, annotations=[
+            {"label": "p50 alarm", "value": alarm_target_response_time_p50_threshold},
+            {"label": "p99 alarm", "value": alarm_target_response_time_p99_threshold}
+        ]),
+        metric_widget("Requests", [
+            ["AWS/ApplicationELB", "RequestCount", *load_balancer],
+            ["AWS/ApplicationELB", "RequestCountPerTarget", *target_group, {"yAxis": "right"}]
+        ], y=0, x=12),
+        metric_widget("HTTP errors", [
+            ["AWS/ApplicationELB", "HTTPCode_Target_4XX_Count", *target_group],
+            ["AWS/ApplicationELB", "HTTPCode_Target_5XX_Count", *target_group],
+            ["AWS/ApplicationELB", "HTTPCode_ELB_4XX_Count", *load_balancer],
+            ["AWS/ApplicationELB", "HTTPCode_ELB_5XX_Count", *load_balancer]
+        ], y=6, x=0),
+        metric_widget("Connections", [
+            ["AWS/ApplicationELB", "ActiveConnectionCount", *load_balancer],
+            ["AWS/ApplicationELB", "NewConnectionCount", *load_balancer],
+            ["AWS/ApplicationELB", "RejectedConnectionCount", *load_balancer, {"yAxis": "right"}],
+            [nginx_metrics_namespace, nginx_metrics_name, *autoscaling_group, "type", "nginx_connections",
+             "type_instance", "active", {"stat": "Average", "label": "Nginx active connections per instance"}]
+        ], y=6, x=12),
+        metric_widget("Healthy hosts per availability zone", [
+            ["AWS/ApplicationELB", "HealthyHostCount", *target_group, "AvailabilityZone", availability_zone]
+            for availability_zone in demo_azs[:demo_az_count]
+        ], stat="Minimum", y=12, x=0, annotations=[{"label": "Healthy hosts alarm", "value": alarm_min_healthy_hosts}]),
+        metric_widget("Autoscaling group capacity", [
+            ["AWS/AutoScaling", metric, *autoscaling_group] for metric in autoscaling_enabled_metrics
+        ], stat="Average", y=12, x=12),
+        # nginx_requests is the running total from stub_status, so the per-second rates are derived with RATE():
+        metric_widget("Nginx requests per second", [
+            [{"expression": f"SEARCH('Namespace=\"{nginx_metrics_namespace}\" MetricName=\"{nginx_metrics_name}\" "
+                            f"type=\"nginx_requests\" AutoScalingGroupName=\"{cluster_name}\" InstanceId', 'Maximum', "
+                            f"{alarm_period})", "id": "requests", "visible": False}],
+            [{"expression": "RATE(requests)", "id": "instances", "label": "Per instance"}],
+            [{"expression": "SUM(RATE(requests))", "id": "group", "label": "Group total", "yAxis": "right"}]
+        ], stat="Maximum", y=18, x=0, width=24)
+    ]
+    if webserver_burstable:
+        # Per-instance EC2 metrics carry only the InstanceId dimension, so the search cannot be narrowed to the group and
+        # shows every instance in the region next to the group minimum:
+        widgets.append(metric_widget("CPU credit balance", [
+            [{"expression": f"SEARCH('{{AWS/EC2,InstanceId}} MetricName=\"CPUCreditBalance\"', 'Minimum', "
+                            f"{alarm_cpu_credit_balance_period})", "id": "instances", "label": "Region instances"}],
+            ["AWS/EC2", "CPUCreditBalance", *autoscaling_group,
+             {"label": "Group minimum", "id": "group", "period": alarm_cpu_credit_balance_period}]
+        ], stat="Minimum", y=24, x=0, width=24, annotations=[
+            {"label": "CPU credit alarm", "value": alarm_cpu_credit_balance_threshold}
+        ]))
+    return json.dumps({"widgets": widgets})
+
+# Creates a dashboard covering latency, traffic, errors, saturation and capacity:
+demo_dashboard = cloudwatch.Dashboard("demo-dashboard",
+    dashboard_name=f"{cluster_name}-{config.region}",
+    dashboard_body=pulumi.Output.all(demo_alb.arn_suffix, demo_target_group.arn_suffix).apply(
+        lambda args: dashboard_body(*args)
+    )
+)
@@ -1,24 +1,164 @@
 from jinja2 import Template
 from pulumi_aws import ssm
 from settings import nginx_stub_status_port, nginx_stub_status_config_parameter_path, general_tags, demo_vpc_cidr, nginx_stub_statuc_path
+from settings import nginx_readiness_path
+from settings import (nginx_main_config_parameter_path, nginx_worker_connections, nginx_worker_rlimit_nofile,
+    nginx_keepalive_timeout, nginx_keepalive_requests, nginx_client_header_timeout, nginx_client_body_timeout,
+    nginx_send_timeout, nginx_client_max_body_size, nginx_open_file_cache_max, nginx_open_file_cache_inactive,
+    nginx_open_file_cache_valid, nginx_gzip_comp_level, nginx_gzip_min_length)
+from settings import (nginx_micro_cache_enabled, nginx_upstream_server, nginx_upstream_keepalive, nginx_micro_cache_path,
+    nginx_micro_cache_keys_zone_mb, nginx_micro_cache_max_size_mb, nginx_micro_cache_inactive, nginx_micro_cache_valid)
 
 """
-Configures Nginx to enable stub status module:
+Configures the Nginx main configuration file, tuned for the web server instance size:
+"""
+# Creates a main configuration file template:
+demo_nginx_main_configuration_file = Template("""
+user nginx;
+worker_processes auto;
+worker_rlimit_nofile {{ worker_rlimit_nofile }};
+error_log /var/log/nginx/error.log;
+pid /run/nginx.pid;
+
+include /usr/share/nginx/modules/*.conf;
+
+events {
+        worker_connections {{ worker_connections }};
+        multi_accept on;
+}
+
+http {
+        log_format main '$remote_addr - $remote_user [$time_local] "$request" '
+                        '$status $body_bytes_sent "$http_referer" '
+                        '"$http_user_agent" "$http_x_forwarded_for" $request_time';
+        access_log /var/log/nginx/access.log main buffer=32k flush=5s;
+
+        sendfile on;
+        tcp_nopush on;
+        tcp_nodelay on;
+        server_tokens off;
+        types_hash_max_size 2048;
+
+        keepalive_timeout {{ keepalive_timeout }}s;
+        keepalive_requests {{ keepalive_requests }};
+        client_header_timeout {{ client_header_timeout }}s;
+        client_body_timeout {{ client_body_timeout }}s;
+        send_timeout {{ send_timeout }}s;
+        client_max_body_size {{ client_max_body_size }};
+        reset_timedout_connection on;
+
+        open_file_cache max={{ open_file_cache_max }} inactive={{ open_file_cache_inactive }}s;
+        open_file_cache_valid {{ open_file_cache_valid }}s;
+        open_file_cache_min_uses 2;
+        open_file_cache_errors on;
+
+        gzip on;
+        gzip_vary on;
+        gzip_proxied any;
+        gzip_comp_level {{ gzip_comp_level }};
+        gzip_min_length {{ gzip_min_length }};
+        gzip_types text/plain text/css text/xml text/javascript application/javascript application/json application/xml image/svg+xml;
+
+        include /etc/nginx/mime.types;
+        default_type application/octet-stream;
+
+        include /etc/nginx/conf.d/*.conf;
+{%- if micro_cache %}
+
+        upstream demo_app {
+                server {{ upstream_server }};
+                keepalive {{ upstream_keepalive }};
+        }
+
+        proxy_cache_path {{ micro_cache_path }} levels=1:2 keys_zone=micro_cache:{{ micro_cache_keys_zone_mb }}m max_size={{ micro_cache_max_size_mb }}m inactive={{ micro_cache_inactive }}s use_temp_path=off;
+{%- endif %}
+
+        server {
+                listen 80 default_server;
+                listen [::]:80 default_server;
+                server_name _;
+                root /usr/share/nginx/html;
+
+                include /etc/nginx/default.d/*.conf;
+{%- if micro_cache %}
+
+                location / {
+                        proxy_pass http://demo_app;
+                        proxy_http_version 1.1;
+                        proxy_set_header Connection "";
+                        proxy_set_header Host $host;
+                        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+
+                        proxy_cache micro_cache;
+                        proxy_cache_valid 200 301 302 {{ micro_cache_valid }}s;
+                        proxy_cache_lock on;
+                        proxy_cache_lock_timeout 5s;
+                        proxy_cache_use_stale error timeout updating http_500 http_502 http_503 http_504;
+                        proxy_cache_background_update on;
+                        add_header X-Cache-Status $upstream_cache_status;
+                }
+{%- endif %}
+        }
+}
+""")
+
+# Renders demo_nginx_main_configuration_file template:
+demo_nginx_main_configuration_values = dict(
+    worker_connections=nginx_worker_connections,
+    worker_rlimit_nofile=nginx_worker_rlimit_nofile,
+    keepalive_timeout=nginx_keepalive_timeout,
+    keepalive_requests=nginx_keepalive_requests,
+    client_header_timeout=nginx_client_header_timeout,
+    client_body_timeout=nginx_client_body_timeout,
+    send_timeout=nginx_send_timeout,
+    client_max_body_size=nginx_client_max_body_size,
+    open_file_cache_max=nginx_open_file_cache_max,
+    open_file_cache_inactive=nginx_open_file_cache_inactive,
+    open_file_cache_valid=nginx_open_file_cache_valid,
+    gzip_comp_level=nginx_gzip_comp_level,
+    gzip_min_length=nginx_gzip_min_length,
+    micro_cache=nginx_micro_cache_enabled,
+    upstream_server=nginx_upstream_server,
+    upstream_keepalive=nginx_upstream_keepalive,
+    micro_cache_path=nginx_micro_cache_path,
+    micro_cache_keys_zone_mb=nginx_micro_cache_keys_zone_mb,
+    micro_cache_max_size_mb=nginx_micro_cache_max_size_mb,
+    micro_cache_inactive=nginx_micro_cache_inactive,
+    micro_cache_valid=nginx_micro_cache_valid
+)
+demo_nginx_main_configuration = demo_nginx_main_configuration_file.render(**demo_nginx_main_configuration_values)
+
+# Creates an SSM Parameter for the main configuration:
+demo_nginx_main_configuration_parameter = ssm.Parameter("demo-nginx-main-config",
+    type="String",
+    data_type="text",
+    name=nginx_main_config_parameter_path,
+    tags={**general_tags, "Name": "demo-nginx-main-config"},
+    value=demo_nginx_main_configuration
+)
+
+"""
+Configures Nginx to enable stub status module and a readiness endpoint:
 """
 # Creates a stub status configuration file template:
 demo_nginx_stub_status_configuration_file = Template("""
 server {
         listen 0.0.0.0:{{ port }};
         access_log off;
+        allow 127.0.0.1;
         allow {{ cidr }};
         location = /{{ path }} {
                 stub_status;
         }
+        location = /{{ readiness_path }} {
+                default_type text/plain;
+                return 200 "ready\n";
+        }
 }
 """)
 
 # Renders demo_nginx_stub_status_configuration_file template:
-demo_nginx_stub_status_configuration = demo_nginx_stub_status_configuration_file.render(port=nginx_stub_status_port, path=nginx_stub_statuc_path, cidr=demo_vpc_cidr)
+demo_nginx_stub_status_configuration = demo_nginx_stub_status_configuration_file.render(port=nginx_stub_status_port, path=nginx_stub_statuc_path, readiness_path=nginx_readiness_path, cidr=demo_vpc_cidr)
 
 # Creates an SSM Parameter for stub status configuration:
 demo_nginx_configuration_parameter = ssm.Parameter("demo-nginx-stub-config",
@@ -27,4 +167,7 @@ demo_nginx_configuration_parameter = ssm.Parameter("demo-nginx-stub-config",
     name=nginx_stub_status_config_parameter_path,
     tags={**general_tags, "Name": "demo-nginx-config"},
     value=demo_nginx_stub_status_configuration
-)
\ No newline at end of file
+)
+
+# Collects every Nginx configuration parameter fetched by the web servers:
+demo_nginx_configuration_parameters = [demo_nginx_main_configuration_parameter, demo_nginx_configuration_parameter]
\ No newline at end of file
@@ -0,0 +1,92 @@
+import json
+import pulumi
+from jinja2 import Template
+from pulumi_aws import ssm, config
+from settings import (general_tags, cluster_name, nginx_config_parameters, nginx_reload_max_concurrency,
+    nginx_reload_max_errors, nginx_reload_timeout)
+from nginx_config import demo_nginx_configuration_parameters
+from autoscaling_group import demo_autoscaling_group
+
+"""
+Demo Nginx Configuration Reload: rolls SSM parameter changes out to running web servers without replacing them
+"""
+# Creates the reload script template; the configuration is validated with nginx -t and restored if it fails:
+demo_nginx_reload_script_template = Template("""
+set -euo pipefail
+if ! systemctl is-active --quiet nginx; then
+  echo "Nginx is not running yet, the user data script applies the configuration at boot"
+  exit 0
+fi
+echo "Applying Nginx configuration parameter versions {% raw %}{{ parameterVersions }}{% endraw %}"
+staging=$(mktemp -d)
+trap 'rm -rf "$staging"' EXIT
+{%- for parameter_path, file_path in nginx_config_parameters.items() %}
+aws ssm get-parameter --name {{ parameter_path }} --region {{ region }} --output text --query Parameter.Value > "$staging/{{ loop.index }}.conf"
+{%- endfor %}
+{%- for parameter_path, file_path in nginx_config_parameters.items() %}
+cp {{ file_path }} "$staging/{{ loop.index }}.previous"
+cp "$staging/{{ loop.index }}.conf" {{ file_path }}
+{%- endfor %}
+if ! nginx -t; then
+  echo "Nginx rejected the new configuration, restoring the previous one"
+{%- for parameter_path, file_path in nginx_config_parameters.items() %}
+  cp "$staging/{{ loop.index }}.previous" {{ file_path }}
+{%- endfor %}
+  exit 1
+fi
+# Graceful reload: workers finish in-flight requests while new workers pick up the configuration
+nginx -s reload
+""")
+
+# Renders the reload script:
+demo_nginx_reload_script = demo_nginx_reload_script_template.render(
+    nginx_config_parameters=nginx_config_parameters,
+    region=config.region
+)
+
+# Creates a Run Command document that fetches, validates and reloads the Nginx configuration:
+demo_nginx_reload_document = ssm.Document("demo-nginx-reload-document",
+    name=f"{cluster_name}-ReloadNginxConfiguration",
+    document_type="Command",
+    document_format="JSON",
+    content=json.dumps({
+        "schemaVersion": "2.2",
+        "description": "Fetch the Nginx configuration from Parameter Store, validate it and reload Nginx",
+        "parameters": {
+            "parameterVersions": {
+                "type": "String",
+                "description": "Configuration parameter versions being applied; a new value re-runs the association",
+                "default": ""
+            }
+        },
+        "mainSteps": [{
+            "action": "aws:runShellScript",
+            "name": "reloadNginx",
+            "inputs": {
+                "timeoutSeconds": str(nginx_reload_timeout),
+                "runCommand": demo_nginx_reload_script.strip().splitlines()
+            }
+        }]
+    }),
+    tags={**general_tags, "Name": "demo-nginx-reload-document"}
+)
+
+# Runs the document across the web servers in rate-limited batches whenever a configuration parameter version changes:
+demo_nginx_reload_association = ssm.Association("demo-nginx-reload-association",
+    association_name=f"{cluster_name}-reload-nginx",
+    name=demo_nginx_reload_document.name,
+    targets=[ssm.AssociationTargetArgs(
+        key="tag:aws:autoscaling:groupName",
+        values=[demo_autoscaling_group.name]
+    )],
+    parameters={
+        "parameterVersions": pulumi.Output.all(*[
+            pulumi.Output.concat(parameter.name, ":", parameter.version.apply(str))
+            for parameter in demo_nginx_configuration_parameters
+        ]).apply(",".join)
+    },
+    max_concurrency=nginx_reload_max_concurrency,
+    max_errors=nginx_reload_max_errors,
+    compliance_severity="MEDIUM",
+    opts=pulumi.ResourceOptions(parent=demo_nginx_reload_document)
+)
@@ -1,3 +1,6 @@
+import os
+import re
+import ipaddress
 import pulumi
 
 project_config = pulumi.Config()
@@ -16,33 +19,422 @@ general_tags = {
 VPC Configuration
 """
 demo_vpc_cidr = "10.100.0.0/16"
-demo_public_subnet_cidrs = [
-    "10.100.0.0/20",
-    "10.100.16.0/20"
-]
-demo_private_subnet_cidrs = [
-    "10.100.32.0/20",
-    "10.100.48.0/20"
+demo_az_count = 2
+demo_subnet_prefix_length = 20
+
+# Fixed (public, private) block indexes of the VPC CIDR per availability zone. The first two AZs keep the blocks the stack
+# has always used, and further AZs take unused blocks, so changing demo_az_count never moves an existing subnet:
+demo_subnet_slots = [(0, 2), (1, 3), (4, 8), (5, 9), (6, 10), (7, 11)]
+demo_subnet_cidrs = [str(cidr) for cidr in ipaddress.ip_network(demo_vpc_cidr).subnets(new_prefix=demo_subnet_prefix_length)]
+if demo_az_count > len(demo_subnet_slots):
+    raise ValueError(f"At most {len(demo_subnet_slots)} availability zones have subnet slots")
+if max(max(slot) for slot in demo_subnet_slots[:demo_az_count]) >= len(demo_subnet_cidrs):
+    raise ValueError(f"{demo_vpc_cidr} cannot fit the subnet slots of {demo_az_count} /{demo_subnet_prefix_length} subnet pairs")
+demo_public_subnet_cidrs = [demo_subnet_cidrs[public] for public, _ in demo_subnet_slots[:demo_az_count]]
+demo_private_subnet_cidrs = [demo_subnet_cidrs[private] for _, private in demo_subnet_slots[:demo_az_count]]
+
+# Interface endpoints sharing one security group, toggled per stack with the "vpc-interface-endpoints" config object:
+vpc_interface_endpoint_services = {
+    "ssm": True,
+    "ssmmessages": True,
+    "ec2messages": True,
+    "logs": True,
+    "monitoring": True,
+    "autoscaling": False,
+    "ec2": False,
+    "sts": False,
+    **(project_config.get_object("vpc-interface-endpoints") or {})
+}
+
+# "Gateway" routes S3 traffic through the private route tables at no charge; "Interface" places an endpoint in each private subnet:
+vpc_s3_endpoint_type = "Gateway"
+if vpc_s3_endpoint_type not in ("Gateway", "Interface"):
+    raise ValueError(f"Unsupported S3 endpoint type: {vpc_s3_endpoint_type}")
+
+"""
+ALB Listener Configuration
+"""
+alb_certificate_arn = project_config.get("alb-certificate-arn")
+alb_https_enabled = alb_certificate_arn is not None
+alb_ssl_policy = "ELBSecurityPolicy-TLS13-1-2-2021-06"
+alb_http2_enabled = True
+alb_idle_timeout = 60
+
+# Deletion protection stays on unless a stack opts out, e.g. right before it is destroyed:
+alb_deletion_protection_enabled = project_config.get_bool("alb-deletion-protection")
+if alb_deletion_protection_enabled is None:
+    alb_deletion_protection_enabled = True
+
+"""
+ALB Access Log Configuration
+"""
+alb_access_logs_enabled = False
+alb_access_logs_prefix = "alb"
+alb_access_logs_expiration_days = 30
+
+if alb_access_logs_enabled and alb_access_logs_expiration_days < 1:
+    raise ValueError("ALB access logs must be kept for at least one day")
+
+"""
+CloudFront Configuration
+"""
+cdn_enabled = False
+cdn_price_class = "PriceClass_100"
+cdn_origin_keepalive_timeout = 60
+cdn_origin_read_timeout = 30
+
+# CloudFront reaches the ALB over HTTPS only, through a domain name covered by the ALB certificate:
+cdn_origin_domain = project_config.get("cdn-origin-domain")
+
+if cdn_enabled and not alb_https_enabled:
+    raise ValueError("CloudFront requires alb-certificate-arn, so the origin verify header never travels in cleartext")
+if cdn_enabled and not cdn_origin_domain:
+    raise ValueError("cdn-origin-domain must be set to a name covered by alb-certificate-arn when CloudFront is enabled")
+
+# The ALB only forwards requests carrying this secret header, so clients cannot bypass the distribution:
+cdn_origin_verify_header = "X-Origin-Verify"
+cdn_origin_verify_secret = project_config.require_secret("cdn-origin-verify-secret") if cdn_enabled else None
+
+# The default behaviour forwards every viewer cookie, header and query string except Host to the ALB, so stateful and
+# authenticated requests keep working; this is the managed AllViewerExceptHostHeader origin request policy:
+cdn_origin_request_policy_id = "b689b0a8-53d0-40ab-baf2-68738e2966ac"
+
+# Cache TTLs in seconds; ordered behaviours are matched by path pattern before falling back to the default. Authorization
+# only reaches the origin as part of the cache key, so the default behaviour caches responses per credential:
+cdn_default_cache_behavior = {"min_ttl": 0, "default_ttl": 60, "max_ttl": 300, "headers": ["Authorization"]}
+cdn_ordered_cache_behaviors = [
+    {"path_pattern": "/static/*", "min_ttl": 0, "default_ttl": 86400, "max_ttl": 31536000},
+    {"path_pattern": "*.css", "min_ttl": 0, "default_ttl": 86400, "max_ttl": 31536000},
+    {"path_pattern": "*.js", "min_ttl": 0, "default_ttl": 86400, "max_ttl": 31536000}
 ]
 
+"""
+ALB Target Group Configuration
+"""
+alb_target_group_algorithm = "least_outstanding_requests"
+alb_target_group_slow_start = 0
+alb_target_group_deregistration_delay = 30
+alb_target_group_stickiness_enabled = False
+alb_target_group_stickiness_duration = 3600
+
+# Slow start ramps new targets up under round robin only; ALB rejects it with least outstanding requests:
+if alb_target_group_slow_start and alb_target_group_algorithm != "round_robin":
+    raise ValueError("ALB slow start requires the round_robin load balancing algorithm")
+if alb_target_group_slow_start and not 30 <= alb_target_group_slow_start <= 900:
+    raise ValueError("ALB slow start must be between 30 and 900 seconds")
+
 """
 EC2 Instance Configuration
 """
 ssh_key_name = project_config.require("ssh-key-name")
+webserver_instance_type = "t3.small"
+webserver_instance_family, webserver_instance_size = webserver_instance_type.split(".")
+
+# Graviton families carry a "g" right after the generation number (t4g, c7g, m6gd); a1 is the first Graviton family:
+def instance_architecture(instance_type):
+    family = instance_type.split(".")[0]
+    return "arm64" if re.match(r"^(a1|[a-z]+\d+g)", family) else "x86_64"
+
+# Burstable families earn and spend CPU credits (t2, t3, t3a, t4g); trn1 and trn2 start with "t" but are not burstable:
+def instance_burstable(instance_type):
+    return re.match(r"^t\d", instance_type.split(".")[0]) is not None
+
+webserver_architecture = instance_architecture(webserver_instance_type)
+webserver_burstable = instance_burstable(webserver_instance_type)
+webserver_root_device_name = "/dev/xvda"
+webserver_root_volume_size = 8
+
+"""
+EC2 Performance Profile Configuration
+"""
+# gp3 decouples IOPS and throughput from volume size; 3000 IOPS and 125 MiB/s are included in its base price:
+webserver_root_volume_type = "gp3"
+webserver_root_volume_iops = 3000
+webserver_root_volume_throughput = 125
+
+# "unlimited" lets burstable instances run above baseline after their credit balance runs out, billed per surplus vCPU hour:
+webserver_cpu_credits = "unlimited" if webserver_burstable else None
+webserver_detailed_monitoring = True
+
+# IMDSv2 only; a hop limit of 1 keeps the metadata service out of reach of anything forwarding from the host:
+webserver_metadata_http_tokens = "required"
+webserver_metadata_hop_limit = 1
+
+if webserver_root_volume_type not in ("gp3", "gp2", "io1", "io2"):
+    raise ValueError(f"Unsupported root volume type: {webserver_root_volume_type}")
+if webserver_root_volume_type == "gp3":
+    if not 3000 <= webserver_root_volume_iops <= min(16000, 500 * webserver_root_volume_size):
+        raise ValueError(f"gp3 IOPS must be between 3000 and 16000, and at most 500 per GiB of a {webserver_root_volume_size} GiB volume")
+    if not 125 <= webserver_root_volume_throughput <= min(1000, webserver_root_volume_iops // 4):
+        raise ValueError("gp3 throughput must be between 125 and 1000 MiB/s, and at most 0.25 MiB/s per provisioned IOPS")
+# Provisioned IOPS volumes allow at most this many IOPS per GiB, up to 64000:
+provisioned_iops_per_gib = {"io1": 50, "io2": 500}
+if webserver_root_volume_type in provisioned_iops_per_gib:
+    max_iops = min(64000, provisioned_iops_per_gib[webserver_root_volume_type] * webserver_root_volume_size)
+    if not 100 <= webserver_root_volume_iops <= max_iops:
+        raise ValueError(f"{webserver_root_volume_type} IOPS must be between 100 and {max_iops} for a volume of {webserver_root_volume_size} GiB")
+if webserver_cpu_credits not in (None, "standard", "unlimited"):
+    raise ValueError(f"Unsupported CPU credit option: {webserver_cpu_credits}")
+if webserver_cpu_credits and not webserver_burstable:
+    raise ValueError(f"{webserver_instance_type} is not a burstable instance type and takes no CPU credit option")
+if webserver_metadata_http_tokens not in ("required", "optional"):
+    raise ValueError(f"Unsupported instance metadata token option: {webserver_metadata_http_tokens}")
+if not 1 <= webserver_metadata_hop_limit <= 64:
+    raise ValueError("Instance metadata hop limit must be between 1 and 64")
+
+"""
+Web Server Image Configuration
+"""
+webserver_image_bake_enabled = False
+webserver_image_version = "1.0.1"
+webserver_image_build_instance_type = webserver_instance_type
 
 """
 Autoscaling Configuration
 """
 cluster_name = "demoWebCluster"
+autoscaling_min_size = 2
+autoscaling_max_size = 8
+autoscaling_default_cooldown = 300
+autoscaling_protect_from_scale_in = False
+autoscaling_enabled_metrics = ["GroupMinSize", "GroupMaxSize", "GroupDesiredCapacity", "GroupInServiceInstances",
+    "GroupPendingInstances", "GroupStandbyInstances", "GroupTerminatingInstances", "GroupTotalInstances"]
+
+"""
+Autoscaling Target Tracking Configuration
+"""
+autoscaling_estimated_instance_warmup = 120
+autoscaling_scale_in_disabled = False
+autoscaling_request_count_per_target = 1000
+autoscaling_cpu_utilization_target = 50.0
+autoscaling_nginx_connections_scaling_enabled = False
+autoscaling_active_connections_per_instance = 500
+
+"""
+Autoscaling Warm Pool Configuration
+"""
+autoscaling_warm_pool_enabled = False
+autoscaling_warm_pool_state = "Stopped"
+autoscaling_warm_pool_min_size = 2
+autoscaling_warm_pool_max_group_prepared_capacity = 4
+autoscaling_warm_pool_reuse_on_scale_in = True
+
+if autoscaling_warm_pool_state not in ("Stopped", "Hibernated", "Running"):
+    raise ValueError(f"Unsupported warm pool state: {autoscaling_warm_pool_state}")
+
+# Hibernation requires the launch template to opt in and an encrypted root volume:
+webserver_hibernation_enabled = autoscaling_warm_pool_enabled and autoscaling_warm_pool_state == "Hibernated"
+
+"""
+Autoscaling Mixed Instances Configuration
+"""
+autoscaling_mixed_instances_enabled = False
+autoscaling_mixed_instance_types = [webserver_instance_type, "t3a.small", "t2.small"]
+autoscaling_on_demand_base_capacity = 2
+autoscaling_on_demand_percentage_above_base_capacity = 25
+autoscaling_spot_allocation_strategy = "capacity-optimized"
+autoscaling_capacity_rebalance = True
+
+if autoscaling_mixed_instances_enabled and autoscaling_warm_pool_enabled:
+    raise ValueError("Warm pools cannot be combined with a mixed instances policy")
+
+mismatched_instance_types = [t for t in autoscaling_mixed_instance_types if instance_architecture(t) != webserver_architecture]
+if autoscaling_mixed_instances_enabled and mismatched_instance_types:
+    raise ValueError(f"Mixed instance types {mismatched_instance_types} do not match the {webserver_architecture} web server AMI")
+
+# The launch template's CPU credit option applies to every override, so they must all be burstable:
+non_burstable_instance_types = [t for t in autoscaling_mixed_instance_types if not instance_burstable(t)]
+if autoscaling_mixed_instances_enabled and webserver_cpu_credits and non_burstable_instance_types:
+    raise ValueError(f"Mixed instance types {non_burstable_instance_types} do not support the {webserver_cpu_credits} CPU credit option")
+
+# Holds new instances in Pending:Wait until the lifecycle agent from user data signals that Nginx is serving. The hook
+# exists with or without a warm pool, so it is already in place when a warm pool is turned on:
+autoscaling_launch_lifecycle_hook_name = "demo-webserver-launching"
+autoscaling_launch_lifecycle_hook_timeout = 600
+# How long the agent waits for the readiness endpoint before abandoning the launch:
+autoscaling_launch_readiness_timeout = 300
+
+if autoscaling_launch_readiness_timeout >= autoscaling_launch_lifecycle_hook_timeout:
+    raise ValueError("The launch readiness timeout must be shorter than the lifecycle hook timeout")
+
+"""
+Autoscaling Instance Refresh Configuration
+"""
+# Launch template changes always start a refresh; these properties start one as well:
+autoscaling_instance_refresh_triggers = ["tag"]
+autoscaling_default_instance_warmup = 2
+autoscaling_instance_refresh_min_healthy_percentage = 90
+autoscaling_instance_refresh_instance_warmup = 60
+autoscaling_instance_refresh_skip_matching = True
+autoscaling_instance_refresh_auto_rollback = True
+
+# The refresh pauses for checkpoint_delay seconds after replacing each percentage of the group; the last checkpoint must be 100:
+autoscaling_instance_refresh_checkpoint_percentages = [25, 100]
+autoscaling_instance_refresh_checkpoint_delay = 180
+
+# Rolls an in-progress refresh back when the target 5xx or latency alarm fires:
+autoscaling_instance_refresh_rollback_alarms_enabled = True
+
+checkpoints = autoscaling_instance_refresh_checkpoint_percentages
+if checkpoints and (checkpoints != sorted(set(checkpoints)) or checkpoints[-1] != 100 or checkpoints[0] < 1):
+    raise ValueError(f"Instance refresh checkpoints must be ascending percentages ending at 100: {checkpoints}")
+if not 0 <= autoscaling_instance_refresh_min_healthy_percentage <= 100:
+    raise ValueError("Instance refresh minimum healthy percentage must be between 0 and 100")
 
 """
 SSM Parameter Store Configuration
 """
 nginx_stub_status_config_parameter_path = f"/{cluster_name}/nginx_stub_status_config"
+nginx_main_config_parameter_path = f"/{cluster_name}/nginx_main_config"
+cloudwatch_agent_config_parameter_path = f"/{cluster_name}/cloudwatch_agent_config"
+collectd_config_parameter_path = f"/{cluster_name}/collectd_config"
 
 """
 Nginx Configuration
 """
 nginx_config_file_path = "/etc/nginx/conf.d/nginx-status.conf"
 nginx_stub_status_port = "8080"
-nginx_stub_statuc_path = "metrics"
\ No newline at end of file
+nginx_stub_statuc_path = "metrics"
+nginx_readiness_path = "ready"
+nginx_main_config_file_path = "/etc/nginx/nginx.conf"
+
+# SSM parameters fetched onto each web server, mapped to their destination files:
+nginx_config_parameters = {
+    nginx_main_config_parameter_path: nginx_main_config_file_path,
+    nginx_stub_status_config_parameter_path: nginx_config_file_path
+}
+
+"""
+Nginx Configuration Reload
+"""
+# The reload association runs on this many instances at a time and stops after this many failures (counts or percentages):
+nginx_reload_max_concurrency = "25%"
+nginx_reload_max_errors = "1"
+nginx_reload_timeout = 120
+
+for setting in (nginx_reload_max_concurrency, nginx_reload_max_errors):
+    if not re.fullmatch(r"[1-9]\d*%?|0", setting):
+        raise ValueError(f"Invalid SSM association rate control: {setting}")
+
+"""
+Health Check Configuration
+"""
+# The ALB probes a static readiness endpoint next to stub_status rather than the stub_status page itself:
+alb_health_check_path = f"/{nginx_readiness_path}"
+alb_health_check_interval = 5
+alb_health_check_timeout = 2
+alb_health_check_healthy_threshold = 2
+alb_health_check_unhealthy_threshold = 2
+
+# Replace instances that fail the ALB health check; the grace period covers a full package install on unbaked images:
+autoscaling_health_check_type = "ELB"
+autoscaling_health_check_grace_period = 60 if webserver_image_bake_enabled or autoscaling_warm_pool_enabled else 300
+
+"""
+Nginx Tuning Configuration
+"""
+# Worker connections scale with the instance size; every proxied request holds a client and an upstream descriptor:
+nginx_worker_connections_by_instance_size = {
+    "nano": 1024,
+    "micro": 2048,
+    "small": 4096,
+    "medium": 8192,
+    "large": 16384,
+    "xlarge": 32768
+}
+nginx_worker_connections = nginx_worker_connections_by_instance_size.get(webserver_instance_size, 65535)
+nginx_worker_rlimit_nofile = nginx_worker_connections * 2
+
+# Keepalive must outlast the ALB idle timeout so the ALB, not Nginx, closes idle connections:
+nginx_keepalive_timeout = alb_idle_timeout + 15
+nginx_keepalive_requests = 10000
+nginx_client_header_timeout = 10
+nginx_client_body_timeout = 10
+nginx_send_timeout = 10
+nginx_client_max_body_size = "1m"
+
+nginx_open_file_cache_max = 10000
+nginx_open_file_cache_inactive = 60
+nginx_open_file_cache_valid = 30
+nginx_gzip_comp_level = 5
+nginx_gzip_min_length = 256
+
+"""
+Nginx Micro-Cache Configuration
+"""
+# Proxies the default server to an application upstream and caches its responses for a few seconds on each node. This
+# stack runs no application, so the upstream host:port has no default and must be set with the "nginx-upstream-server"
+# config key, otherwise every request would fail with a 502 while the readiness endpoint stays healthy:
+nginx_micro_cache_enabled = False
+nginx_upstream_server = project_config.require("nginx-upstream-server") if nginx_micro_cache_enabled else None
+nginx_upstream_keepalive = 32
+# The cache directory is created on every image and instance, so the micro-cache can be turned on with a reload:
+nginx_cache_directory = "/var/cache/nginx"
+nginx_micro_cache_path = f"{nginx_cache_directory}/micro"
+nginx_micro_cache_keys_zone_mb = 10
+nginx_micro_cache_max_size_mb = 1024
+nginx_micro_cache_inactive = 60
+nginx_micro_cache_valid = 1
+
+# General purpose memory per instance size in MiB; the cache keys zone and disk cache must fit within a share of each:
+webserver_memory_mb_by_instance_size = {
+    "nano": 512,
+    "micro": 1024,
+    "small": 2048,
+    "medium": 4096,
+    "large": 8192,
+    "xlarge": 16384
+}
+nginx_micro_cache_memory_budget_mb = webserver_memory_mb_by_instance_size.get(webserver_instance_size, 32768) // 20
+nginx_micro_cache_disk_budget_mb = webserver_root_volume_size * 1024 // 4
+
+if nginx_micro_cache_enabled and nginx_micro_cache_keys_zone_mb > nginx_micro_cache_memory_budget_mb:
+    raise ValueError(f"Micro-cache keys zone of {nginx_micro_cache_keys_zone_mb}MiB exceeds the {nginx_micro_cache_memory_budget_mb}MiB memory budget of a {webserver_instance_type}")
+if nginx_micro_cache_enabled and nginx_micro_cache_max_size_mb > nginx_micro_cache_disk_budget_mb:
+    raise ValueError(f"Micro-cache size of {nginx_micro_cache_max_size_mb}MiB exceeds the {nginx_micro_cache_disk_budget_mb}MiB disk budget of the root volume")
+
+"""
+CloudWatch Agent Configuration
+"""
+collectd_config_file_path = "/etc/collectd.conf"
+collectd_network_port = 25826
+nginx_metrics_namespace = f"{cluster_name}/Nginx"
+nginx_metrics_collection_interval = 60
+
+# The CloudWatch agent names collectd metrics after the plugin; the stub_status field is carried in the type and type_instance dimensions:
+nginx_metrics_name = "collectd_nginx_value"
+
+"""
+CloudWatch Alarm Configuration
+"""
+alarm_notification_email = project_config.get("alarm-notification-email")
+alarm_period = 60
+alarm_evaluation_periods = 3
+alarm_datapoints_to_alarm = 2
+alarm_target_5xx_count_threshold = 10
+alarm_elb_5xx_count_threshold = 10
+alarm_target_response_time_p50_threshold = 0.25
+alarm_target_response_time_p99_threshold = 1.0
+alarm_rejected_connection_count_threshold = 0
+alarm_min_healthy_hosts = max(1, autoscaling_min_size // 2)
+
+# Burstable instances throttle to their baseline once the balance runs out; t3.small earns 24 credits an hour:
+alarm_cpu_credit_balance_threshold = 20
+# EC2 publishes CPUCreditBalance every 5 minutes, even with detailed monitoring:
+alarm_cpu_credit_balance_period = 300
+
+if alarm_datapoints_to_alarm > alarm_evaluation_periods:
+    raise ValueError("Alarm datapoints cannot exceed the evaluation periods")
+
+"""
+Data Source Lookup Configuration
+"""
+# Resolved lookups are cached per stack for lookup_cache_ttl seconds; a TTL of 0 always queries AWS:
+lookup_cache_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".lookup-cache", f"{stack}.json")
+lookup_cache_ttl = project_config.get_int("lookup-cache-ttl")
+if lookup_cache_ttl is None:
+    lookup_cache_ttl = 86400
+
+# Pinning skips the lookups entirely and keeps the fleet on a known image until the pin is changed:
+webserver_ami_id = project_config.get("webserver-ami-id")
+demo_pinned_azs = project_config.get_object("availability-zones")
\ No newline at end of file
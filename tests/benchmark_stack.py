@@ -0,0 +1,44 @@
+"""
+Benchmarks the Pulumi program offline: per-module construction time, resource count and registrations per resource type.
+
+Usage: python tests/benchmark_stack.py [--runs N]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import os
+
+
+def run_once():
+    """Builds the stack in a fresh interpreter, since program modules register their resources on first import."""
+    harness_dir = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, "-c", "import json, stack_harness; print(json.dumps(stack_harness.build_stack().report()))"],
+        cwd=harness_dir, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="number of fresh program runs to aggregate")
+    args = parser.parse_args()
+
+    reports = [run_once() for _ in range(args.runs)]
+    modules = reports[0]["module_construction_seconds"].keys()
+    print(json.dumps({
+        "runs": args.runs,
+        "module_construction_seconds_median": {
+            module: statistics.median(report["module_construction_seconds"][module] for report in reports) for module in modules
+        },
+        "total_construction_seconds_median": statistics.median(report["total_construction_seconds"] for report in reports),
+        "resource_count": reports[0]["resource_count"],
+        "resource_type_counts": reports[0]["resource_type_counts"],
+        "invoke_count": reports[0]["invoke_count"]
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+
+@pytest.fixture(scope="session")
+def stack():
+    """Runs the Pulumi program once per session against offline mocks."""
+    pytest.importorskip("pulumi_aws")
+    from stack_harness import build_stack
+    return build_stack()
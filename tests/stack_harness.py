@@ -0,0 +1,205 @@
+"""
+Offline harness that runs the Pulumi program against mocks and records what it registers.
+"""
+import ast
+import asyncio
+import importlib
+import os
+import sys
+import time
+import types
+from collections import Counter
+
+import pulumi
+from pulumi.runtime import rpc
+from pulumi.runtime.mocks import MockMonitor
+from pulumi.runtime.proto import resource_pb2
+from pulumi.runtime.stack import wait_for_rpcs
+from pulumi.runtime.sync_await import _sync_await
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_NAME = "csf-pulumi-aws-demo"
+STACK_CONFIG = {
+    f"{PROJECT_NAME}:ssh-key-name": "demo-key",
+    "aws:region": "us-east-1",
+    f"{PROJECT_NAME}:lookup-cache-ttl": "0"
+}
+MOCK_AVAILABILITY_ZONES = ["us-east-1a", "us-east-1b", "us-east-1c"]
+MOCK_AMI_ID = "ami-0123456789abcdef0"
+
+
+def unwrap_secrets(value):
+    """Replaces serialized secret wrappers with their plain values so tests can inspect them."""
+    if isinstance(value, dict):
+        if value.get(rpc._special_sig_key) == rpc._special_secret_sig:
+            return unwrap_secrets(value["value"])
+        return {key: unwrap_secrets(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [unwrap_secrets(item) for item in value]
+    return value
+
+
+class StackMocks(pulumi.runtime.Mocks):
+    """Returns resource inputs as outputs and canned data source results, recording every call."""
+
+    def __init__(self):
+        self.resources = []
+        self.invokes = []
+
+    def new_resource(self, args):
+        args.inputs = unwrap_secrets(args.inputs)
+        self.resources.append(args)
+        outputs = {
+            "arn": f"arn:aws:mock:{STACK_CONFIG['aws:region']}:123456789012:{args.name}",
+            "name": args.name,
+            "arnSuffix": f"app/{args.name}/0123456789abcdef",
+            "dnsName": f"{args.name}.{STACK_CONFIG['aws:region']}.elb.amazonaws.com",
+            "domainName": f"{args.name}.cloudfront.net",
+            "bucket": args.name,
+            "latestVersion": 1,
+            "version": 1,
+            "outputResources": [{"amis": [{"image": "ami-baked0123456789"}]}],
+            **args.inputs
+        }
+        return [f"{args.name}-id", outputs]
+
+    def call(self, args):
+        self.invokes.append(args)
+        if args.token == "aws:index/getAvailabilityZones:getAvailabilityZones":
+            return {"names": MOCK_AVAILABILITY_ZONES, "zoneIds": [f"use1-az{i}" for i, _ in enumerate(MOCK_AVAILABILITY_ZONES)]}
+        if args.token == "aws:ec2/getAmi:getAmi":
+            return {"id": MOCK_AMI_ID, "imageId": MOCK_AMI_ID}
+        return {}
+
+
+class StackMonitor(MockMonitor):
+    """A mock monitor without resource reference support, so resources passed as inputs, such as the subnets of
+    endpoints and groups, arrive as their IDs. Rehydrating references would start tasks that can outlive the event
+    loop of their build and break the next one."""
+
+    def GetDeploymentInfo(self, request):
+        info = super().GetDeploymentInfo(request)
+        features = [feature for feature in info.supportedFeatures if feature != resource_pb2.RESOURCE_MONITOR_FEATURE_RESOURCE_REFERENCES]
+        return resource_pb2.DeploymentInfo(supportedFeatures=features)
+
+    def SupportsFeature(self, request):
+        response = super().SupportsFeature(request)
+        response.hasSupport = response.hasSupport and request.id != "resourceReferences"
+        return response
+
+
+class StackResult:
+    """Resources, invokes and per-module construction times of one program run."""
+
+    def __init__(self, mocks, module_timings, outputs):
+        self.resources = mocks.resources
+        self.invokes = mocks.invokes
+        self.module_timings = module_timings
+        self.outputs = outputs
+        # Later builds import the program afresh, so each result keeps the module objects of its own run:
+        self.modules = {module: sys.modules[module] for module in module_timings}
+        self.settings = self.modules["settings"]
+
+    @property
+    def resource_count(self):
+        return len(self.resources)
+
+    @property
+    def resource_type_counts(self):
+        return Counter(resource.typ for resource in self.resources)
+
+    def resources_of_type(self, typ):
+        return [resource for resource in self.resources if resource.typ == typ]
+
+    def resource(self, typ, name):
+        return next(resource for resource in self.resources if resource.typ == typ and resource.name == name)
+
+    def report(self):
+        return {
+            "module_construction_seconds": self.module_timings,
+            "total_construction_seconds": sum(self.module_timings.values()),
+            "resource_count": self.resource_count,
+            "resource_type_counts": dict(sorted(self.resource_type_counts.items())),
+            "invoke_count": len(self.invokes)
+        }
+
+
+def program_tree():
+    with open(os.path.join(PROJECT_ROOT, "__main__.py")) as main_file:
+        return ast.parse(main_file.read())
+
+
+def program_modules():
+    """Lists the modules __main__.py imports, in import order."""
+    return [alias.name for node in program_tree().body if isinstance(node, ast.Import) for alias in node.names if alias.name != "pulumi"]
+
+
+def run_program_outputs():
+    """Runs the rest of __main__.py against the imported modules and returns its stack outputs."""
+    tree = program_tree()
+    tree.body = [node for node in tree.body if not isinstance(node, ast.Import)]
+    outputs = {}
+    namespace = {"pulumi": pulumi, **{module: sys.modules[module] for module in program_modules()}}
+    export = pulumi.export
+    pulumi.export = lambda name, value: outputs.__setitem__(name, value)
+    try:
+        exec(compile(tree, "__main__.py", "exec"), namespace)
+    finally:
+        pulumi.export = export
+    return outputs
+
+
+def load_settings(overrides):
+    """Executes settings.py as the settings module with top-level assignments replaced by overrides, so optional paths that
+    settings.py toggles with constants can be built without editing it. Derived values and validations see the overrides."""
+    path = os.path.join(PROJECT_ROOT, "settings.py")
+    with open(path) as settings_file:
+        tree = ast.parse(settings_file.read())
+    unknown = set(overrides)
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and getattr(node.targets[0], "id", None) in overrides:
+            node.value = ast.parse(repr(overrides[node.targets[0].id]), mode="eval").body
+            unknown.discard(node.targets[0].id)
+    if unknown:
+        raise KeyError(f"settings.py has no top-level assignment to {sorted(unknown)}")
+    module = types.ModuleType("settings")
+    module.__file__ = path
+    sys.modules["settings"] = module
+    exec(compile(ast.fix_missing_locations(tree), path, "exec"), module.__dict__)
+    return module
+
+
+def unload_program():
+    """Forgets previously imported program modules, since they register their resources on import."""
+    for name, module in list(sys.modules.items()):
+        if os.path.dirname(os.path.abspath(getattr(module, "__file__", None) or os.sep)) == PROJECT_ROOT:
+            del sys.modules[name]
+
+
+def build_stack(config=None, settings_overrides=None):
+    """Imports every program module under mocks and waits for all registrations to finish. Each call runs the program
+    afresh with the given stack config and settings.py overrides."""
+    if PROJECT_ROOT not in sys.path:
+        sys.path.insert(0, PROJECT_ROOT)
+    unload_program()
+
+    # Pulumi's synchronous invokes run on the current event loop, which an earlier asyncio.run() may have cleared:
+    asyncio.set_event_loop(asyncio.new_event_loop())
+    mocks = StackMocks()
+    pulumi.runtime.set_mocks(mocks, project=PROJECT_NAME, stack="test", preview=False, monitor=StackMonitor(mocks))
+    pulumi.runtime.set_all_config({**STACK_CONFIG, **(config or {})})
+
+    module_timings = {}
+    for module in program_modules():
+        started = time.perf_counter()
+        if module == "settings":
+            load_settings(settings_overrides or {})
+        else:
+            importlib.import_module(module)
+        module_timings[module] = time.perf_counter() - started
+
+    outputs = run_program_outputs()
+
+    # Data source invokes run synchronously on the default event loop, so registrations are drained on it too:
+    _sync_await(wait_for_rpcs())
+    return StackResult(mocks, module_timings, {name: _sync_await(value.future()) for name, value in outputs.items()})
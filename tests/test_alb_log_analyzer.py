@@ -0,0 +1,58 @@
+import gzip
+import json
+
+import alb_log_analyzer
+
+LOG_LINES = [
+    'http 2024-05-01T10:00:01.000000Z app/demo-pub-alb/abc 203.0.113.1:5000 10.100.32.10:80 0.001 0.120 0.000 200 200 100 512 '
+    '"GET http://demo.example.com:80/api/items?page=2 HTTP/1.1" "curl/8.0" - - arn:aws:elasticloadbalancing:tg "Root=1" "-" "-" 0',
+    'http 2024-05-01T10:00:30.000000Z app/demo-pub-alb/abc 203.0.113.2:5001 10.100.32.10:80 0.002 0.300 0.001 200 200 100 512 '
+    '"GET http://demo.example.com:80/api/items/7 HTTP/1.1" "curl/8.0" - - arn:aws:elasticloadbalancing:tg "Root=2" "-" "-" 0',
+    'http 2024-05-01T10:01:05.000000Z app/demo-pub-alb/abc 203.0.113.3:5002 10.100.48.20:80 0.001 0.050 0.000 200 200 100 512 '
+    '"GET http://demo.example.com:80/ HTTP/1.1" "curl/8.0" - - arn:aws:elasticloadbalancing:tg "Root=3" "-" "-" 0',
+    'http 2024-05-01T10:01:09.000000Z app/demo-pub-alb/abc 203.0.113.4:5003 - -1 -1 -1 503 - 100 0 '
+    '"GET http://demo.example.com:80/ HTTP/1.1" "curl/8.0" - - arn:aws:elasticloadbalancing:tg "Root=4" "-" "-" 0',
+    'not an access log line'
+]
+
+
+def write_log(tmp_path, lines):
+    path = tmp_path / "AWSLogs" / "elasticloadbalancing_us-east-1_app.demo-pub-alb.log.gz"
+    path.parent.mkdir(parents=True)
+    with gzip.open(path, "wt") as log_file:
+        log_file.write("\n".join(lines) + "\n")
+    return path
+
+
+def test_report_groups_by_target_path_and_minute(tmp_path):
+    write_log(tmp_path, LOG_LINES)
+    report = alb_log_analyzer.LatencyReport()
+    for path in alb_log_analyzer.log_files([str(tmp_path)]):
+        report.add_file(path)
+    result = report.to_dict()
+
+    assert result["lines"] == 5
+    assert result["skipped_lines"] == 1
+    assert result["by_target"]["10.100.32.10:80"]["target_processing_time"]["count"] == 2
+    assert result["by_target"]["10.100.32.10:80"]["target_processing_time"]["max"] == 0.3
+    assert result["by_target"]["-"]["target_processing_time"] == {"count": 0}
+    assert set(result["by_path"]) == {"/api/items", "/api/items/7", "/"}
+    assert list(result["by_minute"]) == ["2024-05-01T10:00", "2024-05-01T10:01"]
+
+
+def test_path_depth_bounds_path_cardinality():
+    assert alb_log_analyzer.request_path("GET http://demo:80/api/items/7?x=1 HTTP/1.1", depth=1) == "/api"
+    assert alb_log_analyzer.request_path("- - - ") == "-"
+
+
+def test_read_lines_spans_chunk_boundaries(tmp_path, monkeypatch):
+    monkeypatch.setattr(alb_log_analyzer, "READ_CHUNK_BYTES", 7)
+    path = write_log(tmp_path, LOG_LINES)
+    assert list(alb_log_analyzer.read_lines(str(path))) == LOG_LINES
+
+
+def test_main_prints_json(tmp_path, capsys):
+    path = write_log(tmp_path, LOG_LINES)
+    alb_log_analyzer.main(["--top", "1", str(path)])
+    result = json.loads(capsys.readouterr().out)
+    assert list(result["by_target"]) == ["10.100.32.10:80"]
@@ -0,0 +1,146 @@
+import io
+import shutil
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import deploy_regions
+
+
+class FakeStack:
+    """Records Automation API calls and answers them like a stack with a deployed, deletion-protected ALB."""
+
+    def __init__(self, name, deletion_protection=True, fail=False, log_bucket_force_destroy=None):
+        self.name = name
+        self.deletion_protection = deletion_protection
+        self.log_bucket_force_destroy = log_bucket_force_destroy
+        self.fail = fail
+        self.config = {}
+        self.calls = []
+        self.workspace = SimpleNamespace(remove_stack=lambda stack_name: self.calls.append(("remove", stack_name)))
+
+    def set_config(self, key, value):
+        self.config[key] = value.value
+
+    def export_stack(self):
+        resources = [{
+            "urn": deploy_regions.alb_urn(self.name),
+            "outputs": {"enableDeletionProtection": self.deletion_protection}
+        }]
+        if self.log_bucket_force_destroy is not None:
+            resources.append({
+                "urn": deploy_regions.alb_log_bucket_urn(self.name),
+                "outputs": {"forceDestroy": self.log_bucket_force_destroy}
+            })
+        return SimpleNamespace(deployment={"resources": resources})
+
+    def up(self, on_output=None, target=None):
+        if self.fail:
+            raise RuntimeError("up failed")
+        self.calls.append(("up", target, dict(self.config)))
+        on_output(f"updating {self.config['aws:region']}")
+        return SimpleNamespace(summary=SimpleNamespace(resource_changes={"create": 3}),
+                               outputs={"alb_dns_name": SimpleNamespace(value=f"alb.{self.config['aws:region']}", secret=False)})
+
+    def preview(self, on_output=None):
+        self.calls.append(("preview",))
+        return SimpleNamespace(change_summary={"same": 5})
+
+    def destroy(self, on_output=None):
+        self.calls.append(("destroy", dict(self.config)))
+        return SimpleNamespace(summary=SimpleNamespace(resource_changes={"delete": 3}))
+
+
+def fake_factory(stacks, **options):
+    def factory(stack_name):
+        stacks[stack_name] = FakeStack(stack_name, **options)
+        return stacks[stack_name]
+    return factory
+
+
+def test_up_reports_outputs_per_region():
+    stacks = {}
+    report = deploy_regions.run_regions("up", ["us-east-1", "eu-west-1"], "dev", config={"csf-pulumi-aws-demo:ssh-key-name": "k"},
+                                        stack_factory=fake_factory(stacks), stream=io.StringIO())
+    assert report["succeeded"] == 2
+    assert [stack["outputs"]["alb_dns_name"] for stack in report["stacks"]] == ["alb.us-east-1", "alb.eu-west-1"]
+    assert stacks["dev-eu-west-1"].config == {"aws:region": "eu-west-1", "csf-pulumi-aws-demo:ssh-key-name": "k"}
+
+
+def test_destroy_disables_alb_deletion_protection_first():
+    stacks = {}
+    report = deploy_regions.run_regions("destroy", ["us-east-1"], "dev", stack_factory=fake_factory(stacks), remove=True,
+                                        stream=io.StringIO())
+    calls = stacks["dev-us-east-1"].calls
+    assert calls[0][:2] == ("up", [deploy_regions.alb_urn("dev-us-east-1")])
+    assert calls[0][2]["csf-pulumi-aws-demo:alb-deletion-protection"] == "false"
+    assert [call[0] for call in calls[1:]] == ["destroy", "remove"]
+    assert report["stacks"][0]["alb_deletion_protection_disabled"] is True
+
+
+def test_destroy_skips_update_when_protection_is_off():
+    stacks = {}
+    deploy_regions.run_regions("destroy", ["us-east-1"], "dev", stack_factory=fake_factory(stacks, deletion_protection=False),
+                               stream=io.StringIO())
+    assert [call[0] for call in stacks["dev-us-east-1"].calls] == ["destroy"]
+
+
+def test_destroy_sets_force_destroy_on_an_older_log_bucket():
+    stacks = {}
+    report = deploy_regions.run_regions("destroy", ["us-east-1"], "dev", stream=io.StringIO(),
+                                        stack_factory=fake_factory(stacks, deletion_protection=False,
+                                                                   log_bucket_force_destroy=False))
+    calls = stacks["dev-us-east-1"].calls
+    assert calls[0][:2] == ("up", [deploy_regions.alb_log_bucket_urn("dev-us-east-1")])
+    assert "csf-pulumi-aws-demo:alb-deletion-protection" not in calls[0][2]
+    assert report["stacks"][0]["alb_log_bucket_force_destroy_enabled"] is True
+
+
+def test_failures_are_reported_per_stack():
+    output = io.StringIO()
+    report = deploy_regions.run_regions("up", ["us-east-1"], "dev", stack_factory=fake_factory({}, fail=True), stream=output)
+    assert report["failed"] == 1
+    assert report["stacks"][0]["error"] == "up failed"
+    assert "[dev-us-east-1] up failed: up failed" in output.getvalue()
+
+
+def test_worker_pool_is_bounded():
+    running, peak, lock = [0], [0], threading.Lock()
+
+    class SlowStack(FakeStack):
+        def preview(self, on_output=None):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+            return super().preview(on_output)
+
+    regions = ["us-east-1", "us-east-2", "us-west-1", "us-west-2", "eu-west-1"]
+    report = deploy_regions.run_regions("preview", regions, "dev", parallel=2, stack_factory=SlowStack, stream=io.StringIO())
+    assert peak[0] == 2
+    assert [stack["region"] for stack in report["stacks"]] == regions
+
+
+@pytest.mark.skipif(shutil.which("pulumi") is None, reason="requires the pulumi CLI")
+def test_up_against_local_file_backend(tmp_path, monkeypatch):
+    import pulumi
+    from pulumi import automation as auto
+    monkeypatch.setenv("PULUMI_CONFIG_PASSPHRASE", "test")
+
+    def inline_stack(stack_name):
+        return auto.create_or_select_stack(stack_name, project_name=deploy_regions.PROJECT_NAME,
+            program=lambda: pulumi.export("region", pulumi.Config("aws").require("region")),
+            opts=auto.LocalWorkspaceOptions(env_vars={"PULUMI_BACKEND_URL": f"file://{tmp_path}"}))
+
+    report = deploy_regions.run_regions("up", ["us-east-1", "eu-west-1"], "test", stack_factory=inline_stack,
+                                        stream=io.StringIO())
+    assert [stack["outputs"]["region"] for stack in report["stacks"]] == ["us-east-1", "eu-west-1"]
+
+
+def test_config_entries_default_to_project_namespace():
+    assert deploy_regions.config_entry("ssh-key-name=demo") == ("csf-pulumi-aws-demo:ssh-key-name", "demo")
+    assert deploy_regions.config_entry("aws:profile=ops") == ("aws:profile", "ops")
@@ -0,0 +1,47 @@
+import random
+
+from histogram import LatencyHistogram
+
+
+def test_percentiles_within_precision():
+    generator = random.Random(7)
+    samples = sorted(generator.lognormvariate(-3, 1) for _ in range(20000))
+    histogram = LatencyHistogram(precision=0.01)
+    for sample in samples:
+        histogram.record(sample)
+    for percent in (50, 90, 99):
+        exact = samples[int(len(samples) * percent / 100) - 1]
+        assert abs(histogram.percentile(percent) - exact) / exact <= 0.02
+
+
+def test_sub_resolution_values_share_first_bucket():
+    histogram = LatencyHistogram()
+    for value in (0.0, 0.0, 0.0, 0.5):
+        histogram.record(value)
+    assert histogram.percentile(50) <= histogram.resolution
+    assert histogram.percentile(99) == 0.5
+
+
+def test_merge_combines_counts():
+    first, second = LatencyHistogram(), LatencyHistogram()
+    first.record(0.1, count=3)
+    second.record(0.3)
+    merged = first.merge(second)
+    assert merged.count == 4
+    assert merged.maximum == 0.3
+    assert merged.summary()["p50"] <= 0.101
+
+
+def test_empty_histogram_summary():
+    assert LatencyHistogram().summary() == {"count": 0}
+    assert LatencyHistogram().percentile(50) is None
+
+
+def test_bucket_counts_list_upper_bounds_in_order():
+    histogram = LatencyHistogram()
+    for value in (0.00005, 0.01, 0.01, 0.5):
+        histogram.record(value)
+    buckets = histogram.bucket_counts()
+    assert [bucket["count"] for bucket in buckets] == [1, 2, 1]
+    assert buckets[0]["le"] == histogram.resolution
+    assert 0.01 <= buckets[1]["le"] <= 0.01 * (1 + histogram.precision)
@@ -0,0 +1,86 @@
+import asyncio
+import json
+import socket
+
+import pytest
+
+import load_test
+
+
+def run_against_stand_in(delay=0.0, status=200, **options):
+    async def run():
+        server = await load_test.start_stand_in_server(delay=delay, status=status)
+        try:
+            url = "http://127.0.0.1:%d" % server.sockets[0].getsockname()[1]
+            return await load_test.LoadTest(url, **options).run()
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(run())
+
+
+def test_keepalive_reuses_one_connection_per_worker():
+    report = run_against_stand_in(concurrency=3, duration=0.3)
+    assert report["requests"] > 3
+    assert report["connections_opened"] == 3
+    assert report["status_codes"] == {"200": report["requests"]}
+    assert report["error_rate"] == 0
+    assert report["latency_seconds"]["count"] == report["requests"]
+
+
+def test_without_keepalive_opens_a_connection_per_request():
+    report = run_against_stand_in(concurrency=2, duration=0.2, keepalive=False)
+    assert report["connections_opened"] == report["requests"]
+
+
+def test_rate_paces_requests():
+    # Requests are scheduled from ticket numbers, so exactly rate * duration of them start however slow the host is:
+    report = run_against_stand_in(concurrency=4, duration=0.5, rate=40)
+    assert report["requests"] == 20
+    assert report["duration_seconds"] >= 0.4
+
+
+@pytest.mark.parametrize("status, method", [(204, "GET"), (304, "GET"), (200, "HEAD")])
+def test_bodyless_responses_do_not_wait_for_the_connection_to_close(status, method):
+    report = run_against_stand_in(status=status, concurrency=1, duration=0.2, method=method, timeout=2.0)
+    assert report["status_codes"] == {str(status): report["requests"]}
+    assert report["connections_opened"] == 1
+    assert report["latency_seconds"]["max"] < 1.0
+
+
+def test_report_includes_latency_histogram_buckets():
+    report = run_against_stand_in(concurrency=2, duration=0.2)
+    buckets = report["latency_histogram_seconds"]
+    assert sum(bucket["count"] for bucket in buckets) == report["latency_seconds"]["count"]
+    assert [bucket["le"] for bucket in buckets] == sorted(bucket["le"] for bucket in buckets)
+
+
+def test_latency_includes_server_delay():
+    report = run_against_stand_in(delay=0.05, concurrency=2, duration=0.3)
+    assert report["latency_seconds"]["p50"] >= 0.05
+
+
+def test_path_mix_is_weighted():
+    report = run_against_stand_in(concurrency=2, duration=0.3, path_mix="/:1,/static/app.css:0", seed=1)
+    assert report["latency_seconds_by_path"]["/static/app.css"] == {"count": 0}
+
+
+def test_parse_path_mix_rejects_relative_paths():
+    assert load_test.parse_path_mix("/:3,/health") == (["/", "/health"], [3.0, 1.0])
+    with pytest.raises(ValueError):
+        load_test.parse_path_mix("index.html")
+
+
+def test_unreachable_target_counts_errors():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    report = asyncio.run(load_test.LoadTest(f"http://127.0.0.1:{port}", concurrency=1, duration=0.1, rate=20).run())
+    assert report["requests"] > 0
+    assert report["error_rate"] == 1
+    assert report["errors"]
+
+
+def test_main_prints_json_report(capsys):
+    load_test.main(["--stand-in", "--duration", "0.1", "--concurrency", "1"])
+    assert json.loads(capsys.readouterr().out)["status_codes"]["200"] > 0
@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def lookups(stack):
+    import lookups
+    return lookups
+
+
+def test_lookup_cache_round_trip(lookups, tmp_path):
+    path = str(tmp_path / "cache" / "test.json")
+    assert lookups.write_lookup_cache("ami/us-east-1/x86_64", "ami-1", path=path, ttl=60) == "ami-1"
+    assert lookups.read_lookup_cache("ami/us-east-1/x86_64", path=path, ttl=60) == "ami-1"
+
+
+def test_lookup_cache_misses_unknown_key(lookups, tmp_path):
+    path = str(tmp_path / "test.json")
+    lookups.write_lookup_cache("availability-zones/us-east-1", ["us-east-1a"], path=path, ttl=60)
+    assert lookups.read_lookup_cache("availability-zones/eu-west-1", path=path, ttl=60) is None
+
+
+def test_lookup_cache_expires_after_ttl(lookups, tmp_path, monkeypatch):
+    path = str(tmp_path / "test.json")
+    lookups.write_lookup_cache("ami/us-east-1/arm64", "ami-2", path=path, ttl=60)
+    resolved_at = time.time()
+    monkeypatch.setattr(lookups.time, "time", lambda: resolved_at + 61)
+    assert lookups.read_lookup_cache("ami/us-east-1/arm64", path=path, ttl=60) is None
+
+
+def test_lookup_cache_disabled_with_zero_ttl(lookups, tmp_path):
+    path = tmp_path / "test.json"
+    assert lookups.write_lookup_cache("ami/us-east-1/x86_64", "ami-3", path=str(path), ttl=0) == "ami-3"
+    assert not path.exists()
+    assert lookups.read_lookup_cache("ami/us-east-1/x86_64", path=str(path), ttl=0) is None
+
+
+def test_lookup_cache_ignores_corrupt_file(lookups, tmp_path):
+    path = tmp_path / "test.json"
+    path.write_text("{not json")
+    assert lookups.read_lookup_cache("ami/us-east-1/x86_64", path=str(path), ttl=60) is None
@@ -0,0 +1,211 @@
+import base64
+import json
+
+from stack_harness import MOCK_AVAILABILITY_ZONES
+
+
+# Upper bounds on the default stack's resource graph; raise them deliberately when a change needs more resources:
+RESOURCE_BUDGET = 80
+INVOKE_BUDGET = 2
+CONSTRUCTION_SECONDS_BUDGET = 10
+
+
+def test_alb_cross_zone_load_balancing_enabled(stack):
+    alb = stack.resource("aws:lb/loadBalancer:LoadBalancer", "demo-pub-alb")
+    assert alb.inputs["enableCrossZoneLoadBalancing"] is True
+
+
+def test_alb_deletion_protection_enabled(stack):
+    alb = stack.resource("aws:lb/loadBalancer:LoadBalancer", "demo-pub-alb")
+    assert alb.inputs["enableDeletionProtection"] is True
+
+
+def test_alb_spans_every_public_subnet(stack):
+    alb = stack.resource("aws:lb/loadBalancer:LoadBalancer", "demo-pub-alb")
+    assert len(alb.inputs["subnets"]) == stack.settings.demo_az_count
+
+
+def test_launch_template_has_no_public_ip(stack):
+    launch_template = stack.resource("aws:ec2/launchTemplate:LaunchTemplate", "demo-launch-template")
+    assert [interface["associatePublicIpAddress"] for interface in launch_template.inputs["networkInterfaces"]] == ["false"]
+
+
+def test_launch_template_has_instance_profile(stack):
+    launch_template = stack.resource("aws:ec2/launchTemplate:LaunchTemplate", "demo-launch-template")
+    assert launch_template.inputs["iamInstanceProfile"]["name"] == "demo-instance-profile"
+
+
+def test_autoscaling_group_uses_elb_health_checks(stack):
+    autoscaling_group = stack.resource("aws:autoscaling/group:Group", "demo-autoscaling-group")
+    assert autoscaling_group.inputs["healthCheckType"] == "ELB"
+
+
+def test_target_group_health_check_uses_readiness_endpoint(stack):
+    target_group = stack.resource("aws:lb/targetGroup:TargetGroup", "demo-target-group")
+    assert target_group.inputs["healthCheck"]["path"] == f"/{stack.settings.nginx_readiness_path}"
+
+
+def test_resource_count_within_budget(stack):
+    assert stack.resource_count <= RESOURCE_BUDGET, stack.report()["resource_type_counts"]
+
+
+def test_invoke_count_within_budget(stack):
+    assert len(stack.invokes) <= INVOKE_BUDGET, [invoke.token for invoke in stack.invokes]
+
+
+def test_construction_time_within_budget(stack):
+    assert sum(stack.module_timings.values()) <= CONSTRUCTION_SECONDS_BUDGET, stack.module_timings
+
+
+def test_ssm_parameters_fit_standard_tier(stack):
+    for parameter in stack.resources_of_type("aws:ssm/parameter:Parameter"):
+        assert len(parameter.inputs["value"]) <= 4096, parameter.name
+
+
+def test_nginx_main_configuration_is_tuned(stack):
+    configuration = stack.resource("aws:ssm/parameter:Parameter", "demo-nginx-main-config").inputs["value"]
+    assert "worker_processes auto;" in configuration
+    assert f"worker_connections {stack.settings.nginx_worker_connections};" in configuration
+    assert f"keepalive_timeout {stack.settings.nginx_keepalive_timeout}s;" in configuration
+
+
+def test_stack_exports_alb_endpoint(stack):
+    assert stack.outputs["alb_dns_name"] == "demo-pub-alb.us-east-1.elb.amazonaws.com"
+    assert stack.outputs["endpoint_url"] == "http://demo-pub-alb.us-east-1.elb.amazonaws.com"
+
+
+def test_interface_endpoints_share_one_security_group(stack):
+    security_group = stack.resource("aws:ec2/securityGroup:SecurityGroup", "demo-vpc-ssm-security-group")
+    assert "SSM" not in security_group.inputs["description"]
+    endpoints = [endpoint for endpoint in stack.resources_of_type("aws:ec2/vpcEndpoint:VpcEndpoint")
+                 if endpoint.inputs["vpcEndpointType"] == "Interface"]
+    assert len(endpoints) == sum(stack.settings.vpc_interface_endpoint_services.values())
+    assert all(endpoint.inputs["securityGroupIds"] == ["demo-vpc-ssm-security-group-id"] for endpoint in endpoints)
+
+
+def test_nginx_reload_validates_before_reloading(stack):
+    document = stack.resource("aws:ssm/document:Document", "demo-nginx-reload-document")
+    commands = json.loads(document.inputs["content"])["mainSteps"][0]["inputs"]["runCommand"]
+    assert commands.index("if ! nginx -t; then") < commands.index("nginx -s reload")
+
+
+def test_nginx_reload_association_tracks_parameter_versions(stack):
+    association = stack.resource("aws:ssm/association:Association", "demo-nginx-reload-association")
+    assert association.inputs["parameters"]["parameterVersions"] == ",".join(
+        f"{path}:1" for path in stack.settings.nginx_config_parameters)
+    assert association.inputs["maxConcurrency"] == stack.settings.nginx_reload_max_concurrency
+
+
+def test_instance_refresh_uses_checkpoints_and_rollback(stack):
+    preferences = stack.resource("aws:autoscaling/group:Group", "demo-autoscaling-group").inputs["instanceRefresh"]["preferences"]
+    assert preferences["checkpointPercentages"][-1] == 100
+    assert preferences["skipMatching"] is True
+    assert preferences["autoRollback"] is True
+
+
+def test_rollback_alarms_start_rollback_automation(stack):
+    rule = stack.resource("aws:cloudwatch/eventRule:EventRule", "demo-instance-refresh-rollback-rule")
+    target = stack.resource("aws:cloudwatch/eventTarget:EventTarget", "demo-instance-refresh-rollback-target")
+    assert len(json.loads(rule.inputs["eventPattern"])["resources"]) == 2
+    assert target.inputs["arn"].endswith(":$DEFAULT")
+    assert json.loads(target.inputs["input"])["AutoScalingGroupName"] == [stack.settings.cluster_name]
+
+
+def test_rollback_automation_only_rolls_back_active_refreshes(stack):
+    document = stack.resource("aws:ssm/document:Document", "demo-instance-refresh-rollback-document")
+    steps = json.loads(document.inputs["content"])["mainSteps"]
+    assert [step["name"] for step in steps] == [
+        "describeInstanceRefresh", "checkInstanceRefreshActive", "rollbackInstanceRefresh", "noActiveInstanceRefresh"]
+    assert steps[0]["inputs"]["Api"] == "DescribeInstanceRefreshes"
+    assert steps[1]["inputs"]["Default"] == "noActiveInstanceRefresh"
+
+
+def test_alarms_notify_alarm_topic(stack):
+    for alarm in stack.resources_of_type("aws:cloudwatch/metricAlarm:MetricAlarm"):
+        assert alarm.inputs["alarmActions"] == ["arn:aws:mock:us-east-1:123456789012:demo-alarm-topic"], alarm.name
+
+
+def test_p99_alarm_keeps_its_name(stack):
+    alarm = stack.resource("aws:cloudwatch/metricAlarm:MetricAlarm", "demo-target-response-time-alarm")
+    assert (alarm.inputs["name"], alarm.inputs["extendedStatistic"]) == (
+        f"{stack.settings.cluster_name}-target-response-time-p99", "p99")
+
+
+def test_burstable_web_servers_alarm_on_cpu_credits(stack):
+    alarm = stack.resource("aws:cloudwatch/metricAlarm:MetricAlarm", "demo-cpu-credit-balance-alarm")
+    assert alarm.inputs["dimensions"] == {"AutoScalingGroupName": stack.settings.cluster_name}
+    # CPUCreditBalance arrives every 5 minutes, so a shorter period would never collect enough datapoints to alarm:
+    assert alarm.inputs["period"] == 300
+
+
+def test_dashboard_shows_healthy_hosts_per_availability_zone(stack):
+    dashboard = stack.resource("aws:cloudwatch/dashboard:Dashboard", "demo-dashboard")
+    widgets = {widget["properties"]["title"]: widget for widget in json.loads(dashboard.inputs["dashboardBody"])["widgets"]}
+    healthy_hosts = widgets["Healthy hosts per availability zone"]["properties"]["metrics"]
+    assert [metric[-1] for metric in healthy_hosts] == MOCK_AVAILABILITY_ZONES[:stack.settings.demo_az_count]
+
+
+def test_dashboard_shows_nginx_request_rates(stack):
+    dashboard = stack.resource("aws:cloudwatch/dashboard:Dashboard", "demo-dashboard")
+    widgets = {widget["properties"]["title"]: widget for widget in json.loads(dashboard.inputs["dashboardBody"])["widgets"]}
+    expressions = [metric[0]["expression"] for metric in widgets["Nginx requests per second"]["properties"]["metrics"]]
+    assert 'type="nginx_requests"' in expressions[0]
+    assert expressions[1:] == ["RATE(requests)", "SUM(RATE(requests))"]
+
+
+def test_launch_template_root_volume_is_provisioned_gp3(stack):
+    launch_template = stack.resource("aws:ec2/launchTemplate:LaunchTemplate", "demo-launch-template")
+    ebs = launch_template.inputs["blockDeviceMappings"][0]["ebs"]
+    assert (ebs["volumeType"], ebs["iops"], ebs["throughput"]) == (
+        "gp3", stack.settings.webserver_root_volume_iops, stack.settings.webserver_root_volume_throughput)
+
+
+def test_only_t_generation_families_are_burstable(stack):
+    burstable = {instance_type: stack.settings.instance_burstable(instance_type)
+                 for instance_type in ("t2.micro", "t3.small", "t3a.small", "t4g.small", "trn1.2xlarge", "trn2.48xlarge", "c7g.large")}
+    assert [instance_type for instance_type, is_burstable in burstable.items() if is_burstable] == [
+        "t2.micro", "t3.small", "t3a.small", "t4g.small"]
+
+
+def test_launch_template_performance_profile(stack):
+    launch_template = stack.resource("aws:ec2/launchTemplate:LaunchTemplate", "demo-launch-template")
+    assert launch_template.inputs["creditSpecification"]["cpuCredits"] == "unlimited"
+    assert launch_template.inputs["monitoring"]["enabled"] is True
+    assert launch_template.inputs["metadataOptions"]["httpTokens"] == "required"
+
+
+def test_launch_lifecycle_hook_is_gated_on_readiness(stack):
+    hook = stack.resource("aws:autoscaling/lifecycleHook:LifecycleHook", "demo-launch-lifecycle-hook")
+    assert (hook.inputs["autoscalingGroupName"], hook.inputs["defaultResult"]) == (
+        stack.settings.cluster_name, "ABANDON")
+    launch_template = stack.resource("aws:ec2/launchTemplate:LaunchTemplate", "demo-launch-template")
+    user_data = base64.b64decode(launch_template.inputs["userData"]).decode()
+    assert "imds autoscaling/target-lifecycle-state" in user_data
+    assert f"127.0.0.1:{stack.settings.nginx_stub_status_port}/{stack.settings.nginx_readiness_path}" in user_data
+    assert "--lifecycle-action-result $result" in user_data
+
+
+def test_subnets_keep_their_baseline_cidrs(stack):
+    cidrs = {subnet.name: subnet.inputs["cidrBlock"] for subnet in stack.resources_of_type("aws:ec2/subnet:Subnet")}
+    assert sorted(cidrs.values()) == ["10.100.0.0/20", "10.100.16.0/20", "10.100.32.0/20", "10.100.48.0/20"]
+    assert [cidrs[name] for name in sorted(cidrs) if name.startswith("demo-private-subnet")] == ["10.100.32.0/20", "10.100.48.0/20"]
+
+
+def test_subnet_slots_never_overlap(stack):
+    blocks = [block for slot in stack.settings.demo_subnet_slots for block in slot]
+    assert len(blocks) == len(set(blocks))
+
+
+def test_nginx_micro_cache_configuration_renders(stack):
+    nginx_config = stack.modules["nginx_config"]
+    configuration = nginx_config.demo_nginx_main_configuration_file.render(
+        **{**nginx_config.demo_nginx_main_configuration_values, "micro_cache": True, "upstream_server": "10.100.32.10:8000"})
+    assert f"proxy_cache_path {stack.settings.nginx_micro_cache_path} levels=1:2" in configuration
+    assert "proxy_cache micro_cache;" in configuration
+    assert "server 10.100.32.10:8000;" in configuration
+    assert configuration.count("{") == configuration.count("}")
+    # nginx -t fails unless the cache path's parent exists, so every instance creates it at boot:
+    assert stack.settings.nginx_micro_cache_path.startswith(stack.settings.nginx_cache_directory + "/")
+    launch_template = stack.resource("aws:ec2/launchTemplate:LaunchTemplate", "demo-launch-template")
+    user_data = base64.b64decode(launch_template.inputs["userData"]).decode()
+    assert f"install -d -o nginx -g nginx {stack.settings.nginx_cache_directory}" in user_data
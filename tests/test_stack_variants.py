@@ -0,0 +1,162 @@
+import base64
+import json
+
+import pytest
+
+from stack_harness import PROJECT_NAME
+
+CERTIFICATE_ARN = "arn:aws:acm:us-east-1:123456789012:certificate/0123abcd"
+
+# Optional paths built against the mocks: settings.py overrides, extra stack config and the resource types they add.
+VARIANTS = {
+    "warm-pool": ({"autoscaling_warm_pool_enabled": True, "autoscaling_warm_pool_state": "Hibernated"}, {}, []),
+    "mixed-instances": ({"autoscaling_mixed_instances_enabled": True}, {}, []),
+    "cdn-https": ({"cdn_enabled": True}, {
+        f"{PROJECT_NAME}:alb-certificate-arn": CERTIFICATE_ARN,
+        f"{PROJECT_NAME}:cdn-origin-domain": "origin.example.com",
+        f"{PROJECT_NAME}:cdn-origin-verify-secret": "verify-secret"
+    }, ["aws:cloudfront/distribution:Distribution", "aws:lb/listenerRule:ListenerRule"]),
+    "image-bake": ({"webserver_image_bake_enabled": True}, {}, [
+        "aws:imagebuilder/component:Component", "aws:imagebuilder/image:Image"]),
+    "micro-cache": ({"nginx_micro_cache_enabled": True}, {f"{PROJECT_NAME}:nginx-upstream-server": "10.100.32.10:8000"}, []),
+    "access-logs": ({"alb_access_logs_enabled": True}, {}, ["aws:s3/bucketV2:BucketV2", "aws:s3/bucketPolicy:BucketPolicy"]),
+    "s3-interface-endpoint": ({"vpc_s3_endpoint_type": "Interface"}, {}, ["aws:ec2/vpcEndpoint:VpcEndpoint"]),
+    "three-azs": ({"demo_az_count": 3}, {}, [])
+}
+
+
+@pytest.fixture(scope="module")
+def variant():
+    """Builds each optional path once per module, on first use."""
+    pytest.importorskip("pulumi_aws")
+    from stack_harness import build_stack
+    built = {}
+
+    def build(name):
+        if name not in built:
+            settings_overrides, config, _ = VARIANTS[name]
+            built[name] = build_stack(config, settings_overrides)
+        return built[name]
+    return build
+
+
+def user_data(stack):
+    launch_template = stack.resource("aws:ec2/launchTemplate:LaunchTemplate", "demo-launch-template")
+    return base64.b64decode(launch_template.inputs["userData"]).decode()
+
+
+@pytest.mark.parametrize("name", VARIANTS)
+def test_variant_builds_its_resources(variant, name):
+    stack = variant(name)
+    assert stack.settings.__dict__.items() >= VARIANTS[name][0].items()
+    for resource_type in VARIANTS[name][2]:
+        assert stack.resources_of_type(resource_type), resource_type
+
+
+def test_warm_pool_hibernates_instances_that_wait_on_the_lifecycle_agent(variant):
+    stack = variant("warm-pool")
+    group = stack.resource("aws:autoscaling/group:Group", "demo-autoscaling-group")
+    assert group.inputs["warmPool"]["poolState"] == "Hibernated"
+    launch_template = stack.resource("aws:ec2/launchTemplate:LaunchTemplate", "demo-launch-template")
+    assert launch_template.inputs["hibernationOptions"]["configured"] is True
+    assert launch_template.inputs["blockDeviceMappings"][0]["ebs"]["encrypted"] == "true"
+    # Hibernated instances resume without a boot, so the agent must keep polling rather than run once:
+    assert "Restart=always" in user_data(stack)
+    assert "Warmed:*)" in user_data(stack)
+    hook = stack.resource("aws:autoscaling/lifecycleHook:LifecycleHook", "demo-launch-lifecycle-hook")
+    assert hook.inputs["lifecycleTransition"] == "autoscaling:EC2_INSTANCE_LAUNCHING"
+
+
+def test_mixed_instances_override_the_launch_template_with_burstable_types(variant):
+    stack = variant("mixed-instances")
+    group = stack.resource("aws:autoscaling/group:Group", "demo-autoscaling-group")
+    assert "launchTemplate" not in group.inputs
+    policy = group.inputs["mixedInstancesPolicy"]
+    overrides = [override["instanceType"] for override in policy["launchTemplate"]["overrides"]]
+    assert overrides == list(dict.fromkeys(stack.settings.autoscaling_mixed_instance_types))
+    assert all(stack.settings.instance_burstable(instance_type) for instance_type in overrides)
+    assert policy["instancesDistribution"]["onDemandBaseCapacity"] == stack.settings.autoscaling_on_demand_base_capacity
+    assert group.inputs["capacityRebalance"] is True
+
+
+def test_cdn_reaches_the_alb_over_https_and_forwards_viewer_state(variant):
+    stack = variant("cdn-https")
+    distribution = stack.resource("aws:cloudfront/distribution:Distribution", "demo-cdn")
+    origin = distribution.inputs["origins"][0]
+    assert origin["domainName"] == "origin.example.com"
+    assert origin["customOriginConfig"]["originProtocolPolicy"] == "https-only"
+    assert origin["customHeaders"] == [{"name": "X-Origin-Verify", "value": "verify-secret"}]
+    default_behavior = distribution.inputs["defaultCacheBehavior"]
+    assert default_behavior["originRequestPolicyId"] == stack.settings.cdn_origin_request_policy_id
+    # Only requests carrying the verify header reach the targets; the listener itself answers everything else:
+    rule = stack.resource("aws:lb/listenerRule:ListenerRule", "demo-cdn-origin-verify-rule")
+    assert rule.inputs["conditions"][0]["httpHeader"]["values"] == ["verify-secret"]
+    listeners = {listener.inputs["port"]: listener.inputs for listener in stack.resources_of_type("aws:lb/listener:Listener")}
+    assert listeners[443]["certificateArn"] == CERTIFICATE_ARN
+    assert stack.outputs["endpoint_url"] == "https://demo-cdn.cloudfront.net"
+
+
+@pytest.mark.parametrize("settings_overrides, config, message", [
+    ({"cdn_enabled": True}, {f"{PROJECT_NAME}:cdn-origin-verify-secret": "s"}, "requires alb-certificate-arn"),
+    ({"cdn_enabled": True}, {f"{PROJECT_NAME}:cdn-origin-verify-secret": "s",
+                             f"{PROJECT_NAME}:alb-certificate-arn": CERTIFICATE_ARN}, "cdn-origin-domain must be set"),
+    ({"webserver_root_volume_type": "io1"}, {}, "io1 IOPS must be between 100 and 400"),
+    ({"demo_az_count": 7}, {}, "At most 6 availability zones")
+])
+def test_invalid_settings_are_rejected(settings_overrides, config, message):
+    pytest.importorskip("pulumi_aws")
+    from stack_harness import build_stack
+    with pytest.raises(ValueError, match=message):
+        build_stack(config, settings_overrides)
+
+
+def test_image_bake_launches_the_baked_image_with_the_cache_directory(variant):
+    stack = variant("image-bake")
+    component = stack.resource("aws:imagebuilder/component:Component", "demo-nginx-component")
+    assert f"install -d -o nginx -g nginx {stack.settings.nginx_cache_directory}" in component.inputs["data"]
+    assert "nginx -t" in component.inputs["data"]
+    launch_template = stack.resource("aws:ec2/launchTemplate:LaunchTemplate", "demo-launch-template")
+    assert launch_template.inputs["imageId"] == "ami-baked0123456789"
+    assert "yum install" not in user_data(stack)
+
+
+def test_micro_cache_proxies_to_the_configured_upstream(variant):
+    stack = variant("micro-cache")
+    configuration = stack.resource("aws:ssm/parameter:Parameter", "demo-nginx-main-config").inputs["value"]
+    assert "server 10.100.32.10:8000;" in configuration
+    assert f"proxy_cache_path {stack.settings.nginx_micro_cache_path} " in configuration
+    assert "proxy_pass http://demo_app;" in configuration
+    assert f"install -d -o nginx -g nginx {stack.settings.nginx_cache_directory}" in user_data(stack)
+
+
+def test_access_logs_go_to_a_force_destroyed_bucket_the_alb_can_write(variant):
+    stack = variant("access-logs")
+    bucket = stack.resource("aws:s3/bucketV2:BucketV2", "demo-alb-log-bucket")
+    assert bucket.inputs["forceDestroy"] is True
+    alb = stack.resource("aws:lb/loadBalancer:LoadBalancer", "demo-pub-alb")
+    assert alb.inputs["accessLogs"] == {"bucket": "demo-alb-log-bucket-id", "prefix": "alb", "enabled": True}
+    policy = json.loads(stack.resource("aws:s3/bucketPolicy:BucketPolicy", "demo-alb-log-bucket-policy").inputs["policy"])
+    assert policy["Statement"][0]["Resource"].endswith("/alb/*")
+    assert stack.outputs["alb_log_bucket"] == "demo-alb-log-bucket"
+
+
+def test_s3_interface_endpoint_sits_in_every_private_subnet(variant):
+    stack = variant("s3-interface-endpoint")
+    endpoint = stack.resource("aws:ec2/vpcEndpoint:VpcEndpoint", "demo-endpoint-s3")
+    assert endpoint.inputs["vpcEndpointType"] == "Interface"
+    assert len(endpoint.inputs["subnetIds"]) == stack.settings.demo_az_count
+    assert not [resource for resource in stack.resources_of_type("aws:ec2/vpcEndpoint:VpcEndpoint")
+                if resource.name == "demo-endpoint-s3-gateway"]
+
+
+def test_a_third_availability_zone_keeps_the_existing_subnets(variant):
+    stack = variant("three-azs")
+    cidrs = {subnet.name: subnet.inputs["cidrBlock"] for subnet in stack.resources_of_type("aws:ec2/subnet:Subnet")}
+    assert cidrs == {
+        "demo-public-subnet-us-east-1a": "10.100.0.0/20",
+        "demo-public-subnet-us-east-1b": "10.100.16.0/20",
+        "demo-public-subnet-us-east-1c": "10.100.64.0/20",
+        "demo-private-subnet-us-east-1a": "10.100.32.0/20",
+        "demo-private-subnet-us-east-1b": "10.100.48.0/20",
+        "demo-private-subnet-us-east-1c": "10.100.128.0/20"
+    }
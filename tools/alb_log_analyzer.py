@@ -0,0 +1,132 @@
+"""
+Streams downloaded ALB access log files and reports p50/p90/p99 request, target and response processing times
+per target, per request path and per minute, as JSON.
+
+Usage: python tools/alb_log_analyzer.py [--path-depth N] [--top N] PATH [PATH ...]
+
+PATH is a log file (.log or .log.gz) or a directory searched recursively for them, e.g. one synced with
+aws s3 sync s3://<bucket>/alb/AWSLogs/ ./alb-logs
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from histogram import LatencyHistogram
+
+# The leading fields of an ALB access log entry, up to the quoted request line:
+ALB_LOG_PATTERN = re.compile(
+    r'^(?P<type>\S+) (?P<time>\S+) (?P<elb>\S+) (?P<client>\S+) (?P<target>\S+) '
+    r'(?P<request_processing_time>\S+) (?P<target_processing_time>\S+) (?P<response_processing_time>\S+) '
+    r'(?P<elb_status_code>\S+) (?P<target_status_code>\S+) (?P<received_bytes>\S+) (?P<sent_bytes>\S+) '
+    r'"(?P<request>[^"]*)"'
+)
+TIMING_FIELDS = ("request_processing_time", "target_processing_time", "response_processing_time")
+READ_CHUNK_BYTES = 1024 * 1024
+
+
+def log_files(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, file_names in sorted(os.walk(path)):
+                for file_name in sorted(file_names):
+                    if file_name.endswith((".log", ".log.gz")):
+                        yield os.path.join(directory, file_name)
+        else:
+            yield path
+
+
+def read_lines(path):
+    """Yields decoded lines, decompressing READ_CHUNK_BYTES at a time so whole files are never held in memory."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as log_file:
+        pending = b""
+        for chunk in iter(lambda: log_file.read(READ_CHUNK_BYTES), b""):
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line.decode("utf-8", errors="replace")
+        if pending:
+            yield pending.decode("utf-8", errors="replace")
+
+
+def request_path(request, depth=None):
+    # The request field reads "GET https://example.com:443/path?query HTTP/2.0", or "- - - " when no request was parsed:
+    parts = request.split(" ")
+    path = urlsplit(parts[1]).path if len(parts) > 1 and parts[1] != "-" else "-"
+    if depth:
+        path = "/" + "/".join(path.strip("/").split("/")[:depth])
+    return path or "/"
+
+
+class LatencyReport:
+    """Aggregates timing histograms for each target, path and minute."""
+
+    def __init__(self, path_depth=None):
+        self.path_depth = path_depth
+        self.lines = 0
+        self.skipped = 0
+        self.groups = {dimension: defaultdict(lambda: {field: LatencyHistogram() for field in TIMING_FIELDS})
+                       for dimension in ("target", "path", "minute")}
+
+    def add_line(self, line):
+        self.lines += 1
+        entry = ALB_LOG_PATTERN.match(line)
+        if entry is None:
+            self.skipped += 1
+            return
+        keys = {
+            "target": entry["target"],
+            "path": request_path(entry["request"], self.path_depth),
+            "minute": entry["time"][:16]
+        }
+        histograms = [self.groups[dimension][key] for dimension, key in keys.items()]
+        for field in TIMING_FIELDS:
+            value = float(entry[field])
+            # ALB writes -1 for a timing it could not measure, e.g. when the target never responded:
+            if value < 0:
+                continue
+            for group in histograms:
+                group[field].record(value)
+
+    def add_file(self, path):
+        for line in read_lines(path):
+            if line:
+                self.add_line(line)
+
+    def to_dict(self, top=None):
+        def summarize(groups, ordered_keys):
+            return {key: {field: groups[key][field].summary() for field in TIMING_FIELDS} for key in ordered_keys}
+
+        def busiest(groups):
+            return sorted(groups, key=lambda key: -groups[key]["request_processing_time"].count)[:top]
+
+        return {
+            "lines": self.lines,
+            "skipped_lines": self.skipped,
+            "by_target": summarize(self.groups["target"], busiest(self.groups["target"])),
+            "by_path": summarize(self.groups["path"], busiest(self.groups["path"])),
+            "by_minute": summarize(self.groups["minute"], sorted(self.groups["minute"]))
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="ALB access log files or directories")
+    parser.add_argument("--path-depth", type=int, help="group paths by their first N segments to bound cardinality")
+    parser.add_argument("--top", type=int, default=50, help="number of busiest targets and paths to report")
+    args = parser.parse_args(argv)
+
+    report = LatencyReport(path_depth=args.path_depth)
+    for path in log_files(args.paths):
+        report.add_file(path)
+    json.dump(report.to_dict(top=args.top), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Deploys, previews or destroys the program in several AWS regions at once with the Pulumi Automation API, one stack per
+region, and prints a JSON report of outputs, resource changes and timing. Progress is streamed to stderr, one line
+prefixed with the stack name at a time.
+
+Usage: python tools/deploy_regions.py {up,preview,destroy} --regions us-east-1,eu-west-1 [options]
+
+Stacks are named <stack-prefix>-<region>. Destroy first turns ALB deletion protection off through the
+alb-deletion-protection stack config and a targeted update of the ALB, then destroys the stack. The same targeted update
+records force_destroy on an ALB access log bucket deployed before the bucket set it, so the non-empty bucket is deleted.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from pulumi import automation as auto
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_NAME = "csf-pulumi-aws-demo"
+ALB_TYPE = "aws:lb/loadBalancer:LoadBalancer"
+ALB_NAME = "demo-pub-alb"
+ALB_LOG_BUCKET_TYPE = "aws:s3/bucketV2:BucketV2"
+ALB_LOG_BUCKET_NAME = "demo-alb-log-bucket"
+OPERATIONS = ("up", "preview", "destroy")
+
+_output_lock = threading.Lock()
+
+
+def stream_output(stack_name, stream=None):
+    """Returns an on_output callback that writes whole lines prefixed with the stack name."""
+    def write(line):
+        with _output_lock:
+            print(f"[{stack_name}] {line.rstrip()}", file=stream or sys.stderr, flush=True)
+    return write
+
+
+def select_stack(stack_name, work_dir=PROJECT_ROOT, backend_url=None, secrets_provider=None):
+    env_vars = {"PULUMI_BACKEND_URL": backend_url} if backend_url else None
+    return auto.create_or_select_stack(stack_name, work_dir=work_dir, opts=auto.LocalWorkspaceOptions(
+        work_dir=work_dir, env_vars=env_vars, secrets_provider=secrets_provider
+    ))
+
+
+def alb_urn(stack_name):
+    return f"urn:pulumi:{stack_name}::{PROJECT_NAME}::{ALB_TYPE}::{ALB_NAME}"
+
+
+def alb_log_bucket_urn(stack_name):
+    return f"urn:pulumi:{stack_name}::{PROJECT_NAME}::{ALB_LOG_BUCKET_TYPE}::{ALB_LOG_BUCKET_NAME}"
+
+
+def deployed_resources(stack):
+    deployment = stack.export_stack().deployment or {}
+    return {resource["urn"]: resource for resource in deployment.get("resources") or []}
+
+
+def change_counts(changes):
+    # Change summaries are keyed by OpType enums, which are not JSON serializable:
+    return {getattr(op, "value", op): count for op, count in (changes or {}).items()}
+
+
+def prepare_destroy(stack, stack_name, on_output):
+    """Updates what destroy cannot delete as deployed: a deletion-protected ALB and an ALB log bucket without
+    force_destroy. Returns whether each had to be updated."""
+    resources = deployed_resources(stack)
+    alb = resources.get(alb_urn(stack_name))
+    log_bucket = resources.get(alb_log_bucket_urn(stack_name))
+    disable_protection = alb is not None and (alb.get("outputs") or {}).get("enableDeletionProtection", True)
+    force_destroy = log_bucket is not None and not (log_bucket.get("outputs") or {}).get("forceDestroy", False)
+    if disable_protection:
+        stack.set_config(f"{PROJECT_NAME}:alb-deletion-protection", auto.ConfigValue(value="false"))
+    targets = [urn for urn, needed in ((alb_urn(stack_name), disable_protection),
+                                       (alb_log_bucket_urn(stack_name), force_destroy)) if needed]
+    if targets:
+        stack.up(target=targets, on_output=on_output)
+    return {"alb_deletion_protection_disabled": disable_protection, "alb_log_bucket_force_destroy_enabled": force_destroy}
+
+
+def run_region(operation, region, stack_prefix, config=None, stack_factory=select_stack, remove=False, stream=None):
+    """Runs one operation against one region's stack and returns its report entry; failures are reported, not raised."""
+    stack_name = f"{stack_prefix}-{region}"
+    on_output = stream_output(stack_name, stream)
+    report = {"region": region, "stack": stack_name, "operation": operation}
+    started = time.perf_counter()
+    try:
+        stack = stack_factory(stack_name)
+        stack.set_config("aws:region", auto.ConfigValue(value=region))
+        for key, value in (config or {}).items():
+            stack.set_config(key, auto.ConfigValue(value=value))
+
+        if operation == "up":
+            result = stack.up(on_output=on_output)
+            report["resource_changes"] = change_counts(result.summary.resource_changes)
+            report["outputs"] = {name: "[secret]" if output.secret else output.value for name, output in result.outputs.items()}
+        elif operation == "preview":
+            result = stack.preview(on_output=on_output)
+            report["resource_changes"] = change_counts(result.change_summary)
+        else:
+            report.update(prepare_destroy(stack, stack_name, on_output))
+            result = stack.destroy(on_output=on_output)
+            report["resource_changes"] = change_counts(result.summary.resource_changes)
+            if remove:
+                stack.workspace.remove_stack(stack_name)
+        report["status"] = "succeeded"
+    except Exception as error:
+        on_output(f"{operation} failed: {error}")
+        report["status"] = "failed"
+        report["error"] = str(error)
+    report["duration_seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def run_regions(operation, regions, stack_prefix, parallel=4, config=None, stack_factory=select_stack, remove=False,
+                stream=None):
+    """Runs an operation across regions on a bounded worker pool and collects one report in region order."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, min(parallel, len(regions)))) as pool:
+        stacks = list(pool.map(
+            lambda region: run_region(operation, region, stack_prefix, config, stack_factory, remove, stream), regions
+        ))
+    return {
+        "operation": operation,
+        "parallel": parallel,
+        "total_seconds": round(time.perf_counter() - started, 3),
+        "succeeded": sum(stack["status"] == "succeeded" for stack in stacks),
+        "failed": sum(stack["status"] == "failed" for stack in stacks),
+        "stacks": stacks
+    }
+
+
+def config_entry(entry):
+    key, separator, value = entry.partition("=")
+    if not separator:
+        raise argparse.ArgumentTypeError(f"config entries must look like key=value: {entry}")
+    # Unqualified keys belong to this project, like `pulumi config set` treats them:
+    return (key if ":" in key else f"{PROJECT_NAME}:{key}"), value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("operation", choices=OPERATIONS)
+    parser.add_argument("--regions", required=True, help="comma separated AWS regions")
+    parser.add_argument("--stack-prefix", default="dev", help="stack name prefix; stacks are named <prefix>-<region>")
+    parser.add_argument("--parallel", type=int, default=4, help="number of regions to run at once")
+    parser.add_argument("--config", action="append", type=config_entry, default=[], metavar="KEY=VALUE",
+                        help="stack config applied to every region, e.g. ssh-key-name=demo-key")
+    parser.add_argument("--backend-url", help="Pulumi backend, e.g. file://~/.pulumi-state (default: the logged in backend)")
+    parser.add_argument("--secrets-provider", help="secrets provider for new stacks, e.g. passphrase")
+    parser.add_argument("--remove", action="store_true", help="remove the stacks after destroy")
+    parser.add_argument("--report", help="also write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    regions = [region.strip() for region in args.regions.split(",") if region.strip()]
+    report = run_regions(args.operation, regions, args.stack_prefix, args.parallel, dict(args.config),
+                         lambda stack_name: select_stack(stack_name, backend_url=args.backend_url,
+                                                         secrets_provider=args.secrets_provider),
+                         args.remove)
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
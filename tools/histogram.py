@@ -0,0 +1,70 @@
+"""
+Fixed-memory latency histogram with logarithmic buckets, so percentiles over millions of samples stay within a relative error bound.
+"""
+import math
+
+
+class LatencyHistogram:
+    """Counts latencies in seconds into buckets whose upper bounds grow by (1 + precision)."""
+
+    def __init__(self, precision=0.01, resolution=0.0001):
+        self.precision = precision
+        self.resolution = resolution
+        self._log_base = math.log1p(precision)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+
+    def _bucket(self, value):
+        # Bucket 0 holds everything at or below the resolution, including the 0.000 ALB logs report for sub-millisecond work:
+        if value <= self.resolution:
+            return 0
+        return 1 + int(math.ceil(math.log(value / self.resolution) / self._log_base - 1e-9))
+
+    def _upper_bound(self, bucket):
+        return self.resolution * math.exp((bucket - 1) * self._log_base) if bucket else self.resolution
+
+    def record(self, value, count=1):
+        bucket = self._bucket(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += count
+        self.total += value * count
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other):
+        for bucket, count in other.buckets.items():
+            self.buckets[bucket] = self.buckets.get(bucket, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    def percentile(self, percent):
+        """Returns the smallest bucket bound covering percent of the samples, clamped to the observed range."""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(self.count * percent / 100))
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(max(self._upper_bound(bucket), self.minimum), self.maximum)
+        return self.maximum
+
+    def bucket_counts(self):
+        """Returns the non-empty buckets in ascending order as their upper bound in seconds and sample count."""
+        return [{"le": round(self._upper_bound(bucket), 6), "count": self.buckets[bucket]} for bucket in sorted(self.buckets)]
+
+    def summary(self, percentiles=(50, 90, 99)):
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 6),
+            **{f"p{percent}": round(self.percentile(percent), 6) for percent in percentiles},
+            "max": round(self.maximum, 6)
+        }
@@ -0,0 +1,259 @@
+"""
+Asyncio HTTP/1.1 load generator for the stack endpoint. Reports throughput, latency percentiles and error rates as JSON.
+
+Usage: python tools/load_test.py [options] URL
+       python tools/load_test.py [options] --stand-in
+
+URL is typically $(pulumi stack output endpoint_url). --stand-in starts a local keepalive HTTP server in place of
+nginx, so the tool can be exercised offline. The path mix is a comma separated list of PATH[:WEIGHT] entries.
+With --rate, latency is measured from each request's scheduled start, so a stalled server shows up as latency
+instead of silently lowering the request rate.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import ssl
+import sys
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from histogram import LatencyHistogram
+
+USER_AGENT = "csf-pulumi-aws-demo-load-test"
+
+
+def parse_path_mix(path_mix):
+    paths, weights = [], []
+    for entry in path_mix.split(","):
+        path, _, weight = entry.strip().partition(":")
+        if not path.startswith("/"):
+            raise ValueError(f"Path must start with '/': {path}")
+        paths.append(path)
+        weights.append(float(weight) if weight else 1.0)
+    return paths, weights
+
+
+class Connection:
+    """One HTTP/1.1 connection, reused across requests while both ends keep it alive."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def open(cls, target):
+        reader, writer = await asyncio.open_connection(target.hostname, target.port, ssl=target.ssl_context,
+                                                       server_hostname=target.hostname if target.ssl_context else None)
+        return cls(reader, writer)
+
+    async def request(self, target, path, keepalive, method="GET"):
+        self.writer.write((
+            f"{method} {path} HTTP/1.1\r\nHost: {target.host_header}\r\nUser-Agent: {USER_AGENT}\r\n"
+            f"Accept-Encoding: identity\r\nConnection: {'keep-alive' if keepalive else 'close'}\r\n\r\n"
+        ).encode("ascii"))
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed before response")
+        status = int(status_line.split()[1])
+        headers = {}
+        while (line := await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        # Interim, 204 and 304 responses and answers to HEAD never carry a body, whatever their headers say:
+        if method == "HEAD" or status < 200 or status in (204, 304):
+            pass
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            while (size := int((await self.reader.readline()).split(b";")[0], 16)):
+                await self.reader.readexactly(size + 2)
+            while await self.reader.readline() not in (b"\r\n", b"\n", b""):
+                pass
+        elif "content-length" in headers:
+            await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            await self.reader.read()
+            headers["connection"] = "close"
+        reusable = keepalive and headers.get("connection", "").lower() != "close"
+        return status, reusable
+
+    def close(self):
+        self.writer.close()
+
+
+class Target:
+    def __init__(self, url, insecure=False):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported URL scheme: {url}")
+        self.hostname = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.host_header = parts.netloc
+        self.base_path = parts.path.rstrip("/")
+        self.ssl_context = None
+        if parts.scheme == "https":
+            self.ssl_context = ssl.create_default_context()
+            if insecure:
+                self.ssl_context.check_hostname = False
+                self.ssl_context.verify_mode = ssl.CERT_NONE
+
+
+class LoadTest:
+    """Runs concurrency workers against a target for a fixed duration, optionally paced to a total request rate."""
+
+    def __init__(self, url, concurrency=10, rate=None, duration=10.0, keepalive=True, path_mix="/", timeout=10.0,
+                 insecure=False, seed=None, method="GET"):
+        self.target = Target(url, insecure)
+        self.method = method
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.keepalive = keepalive
+        self.paths, self.weights = parse_path_mix(path_mix)
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.latency = LatencyHistogram()
+        self.path_latency = {path: LatencyHistogram() for path in self.paths}
+        self.statuses = Counter()
+        self.errors = Counter()
+        self.connections_opened = 0
+
+    async def worker(self, tickets, started, deadline):
+        connection = None
+        try:
+            for ticket in tickets:
+                scheduled = started + ticket / self.rate if self.rate else time.perf_counter()
+                if scheduled >= deadline:
+                    return
+                if (delay := scheduled - time.perf_counter()) > 0:
+                    await asyncio.sleep(delay)
+                path = self.random.choices(self.paths, self.weights)[0]
+                try:
+                    if connection is None:
+                        connection = await asyncio.wait_for(Connection.open(self.target), self.timeout)
+                        self.connections_opened += 1
+                    status, reusable = await asyncio.wait_for(
+                        connection.request(self.target, self.target.base_path + path, self.keepalive, self.method),
+                        self.timeout)
+                except (OSError, EOFError, ValueError, IndexError, asyncio.TimeoutError, asyncio.IncompleteReadError) as error:
+                    self.errors[type(error).__name__] += 1
+                    reusable = False
+                else:
+                    elapsed = time.perf_counter() - scheduled
+                    self.latency.record(elapsed)
+                    self.path_latency[path].record(elapsed)
+                    self.statuses[status] += 1
+                if not reusable and connection is not None:
+                    connection.close()
+                    connection = None
+        finally:
+            if connection is not None:
+                connection.close()
+
+    async def run(self):
+        started = time.perf_counter()
+        deadline = started + self.duration
+        tickets = itertools.count()
+        await asyncio.gather(*(self.worker(tickets, started, deadline) for _ in range(self.concurrency)))
+        self.elapsed = time.perf_counter() - started
+        return self.report()
+
+    def report(self):
+        responses = sum(self.statuses.values())
+        requests = responses + sum(self.errors.values())
+        failed = sum(self.errors.values()) + sum(count for status, count in self.statuses.items() if status >= 500)
+        return {
+            "target": f"{'https' if self.target.ssl_context else 'http'}://{self.target.host_header}{self.target.base_path}",
+            "method": self.method,
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "keepalive": self.keepalive,
+            "duration_seconds": round(self.elapsed, 3),
+            "requests": requests,
+            "throughput_rps": round(requests / self.elapsed, 2) if self.elapsed else 0,
+            "connections_opened": self.connections_opened,
+            "status_codes": {str(status): count for status, count in sorted(self.statuses.items())},
+            "errors": dict(self.errors),
+            "error_rate": round(failed / requests, 4) if requests else 0,
+            "latency_seconds": self.latency.summary(),
+            "latency_histogram_seconds": self.latency.bucket_counts(),
+            "latency_seconds_by_path": {path: histogram.summary() for path, histogram in self.path_latency.items()}
+        }
+
+
+async def start_stand_in_server(host="127.0.0.1", port=0, delay=0.0, body=b"ok\n", status=200):
+    """Starts a minimal keepalive HTTP/1.1 server answering every request with status, standing in for nginx. Like nginx,
+    it sends neither a body nor a Content-Length for 204 and 304, and no body for HEAD."""
+    reason = {200: b"OK", 204: b"No Content", 304: b"Not Modified"}.get(status, b"Status")
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                close = False
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    close = close or line.lower().startswith(b"connection:") and b"close" in line.lower()
+                if delay:
+                    await asyncio.sleep(delay)
+                headers = b"Connection: %s\r\n" % (b"close" if close else b"keep-alive")
+                if status not in (204, 304):
+                    headers += b"Content-Type: text/plain\r\nContent-Length: %d\r\n" % len(body)
+                payload = b"" if status in (204, 304) or request_line.startswith(b"HEAD ") else body
+                writer.write(b"HTTP/1.1 %d %s\r\n%s\r\n%s" % (status, reason, headers, payload))
+                await writer.drain()
+                if close:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+
+async def run_load_test(args):
+    url = args.url
+    server = None
+    if args.stand_in:
+        server = await start_stand_in_server(delay=args.stand_in_delay)
+        url = "http://%s:%d" % server.sockets[0].getsockname()[:2]
+    try:
+        return await LoadTest(url, concurrency=args.concurrency, rate=args.rate, duration=args.duration,
+                              keepalive=args.keepalive, path_mix=args.paths, timeout=args.timeout,
+                              insecure=args.insecure, seed=args.seed, method=args.method).run()
+    finally:
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url", nargs="?", help="endpoint URL, e.g. the endpoint_url stack output")
+    parser.add_argument("--concurrency", type=int, default=10, help="number of concurrent connections")
+    parser.add_argument("--rate", type=float, help="total requests per second (default: as fast as possible)")
+    parser.add_argument("--duration", type=float, default=10.0, help="test duration in seconds")
+    parser.add_argument("--method", choices=("GET", "HEAD"), default="GET", help="request method")
+    parser.add_argument("--no-keepalive", dest="keepalive", action="store_false", help="open a new connection per request")
+    parser.add_argument("--paths", default="/", help="weighted path mix, e.g. '/:8,/static/app.css:2'")
+    parser.add_argument("--timeout", type=float, default=10.0, help="per request timeout in seconds")
+    parser.add_argument("--insecure", action="store_true", help="skip TLS certificate verification")
+    parser.add_argument("--seed", type=int, help="seed for the path mix")
+    parser.add_argument("--stand-in", action="store_true", help="target a local stand-in server instead of URL")
+    parser.add_argument("--stand-in-delay", type=float, default=0.0, help="stand-in response delay in seconds")
+    args = parser.parse_args(argv)
+    if not args.url and not args.stand_in:
+        parser.error("a URL or --stand-in is required")
+
+    json.dump(asyncio.run(run_load_test(args)), sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,7 +2,9 @@ from jinja2 import Template
 import base64
 
 from pulumi_aws import config
-from settings import nginx_stub_status_config_parameter_path, nginx_config_file_path
+from settings import (nginx_config_parameters, webserver_image_bake_enabled, collectd_config_parameter_path,
+    collectd_config_file_path, cloudwatch_agent_config_parameter_path, cluster_name, autoscaling_launch_lifecycle_hook_name,
+    autoscaling_launch_readiness_timeout, nginx_stub_status_port, nginx_readiness_path, nginx_cache_directory)
 
 """
 EC2 Web Server Instance User Data Script
@@ -10,22 +12,104 @@ EC2 Web Server Instance User Data Script
 # Creates user data bash script template:
 demo_webserver_user_data_template = Template("""
 #!/bin/bash
+{%- if not baked_image %}
 # Run an update
 yum update -y
 
-# Install Nginx and configure the stub_status module
+# Install Nginx
 amazon-linux-extras install nginx1.12 -y
-aws ssm get-parameter --name {{ nginx_stub_status_config_parameter_path }} --region {{ region }} --output text --query Parameter.Value > {{ nginx_config_file_path }}
 
-# Start Nginx
-systemctl daemon-reload && systemctl enable nginx && systemctl start nginx
+# Install collectd with its Nginx plugin and the CloudWatch agent
+amazon-linux-extras install collectd -y
+yum install -y collectd-nginx amazon-cloudwatch-agent
+{%- endif %}
+
+# Fetch the latest Nginx main configuration and configure the stub_status module
+{%- for parameter_path, file_path in nginx_config_parameters.items() %}
+aws ssm get-parameter --name {{ parameter_path }} --region {{ region }} --output text --query Parameter.Value > {{ file_path }}
+{%- endfor %}
+
+# Create the cache directory the Nginx micro-cache writes to
+install -d -o nginx -g nginx {{ nginx_cache_directory }}
+
+# Start Nginx, or restart it to pick up the fetched configuration on a pre-baked image
+systemctl daemon-reload && systemctl enable nginx && systemctl restart nginx
+
+# Scrape stub_status with collectd and publish the readings through the CloudWatch agent
+aws ssm get-parameter --name {{ collectd_config_parameter_path }} --region {{ region }} --output text --query Parameter.Value > {{ collectd_config_file_path }}
+systemctl enable collectd && systemctl restart collectd
+/opt/aws/amazon-cloudwatch-agent/bin/amazon-cloudwatch-agent-ctl -a fetch-config -m ec2 -s -c ssm:{{ cloudwatch_agent_config_parameter_path }}
+
+# Complete the launch lifecycle action whenever Auto Scaling moves this instance into service or into the warm pool,
+# continuing only once Nginx serves the readiness endpoint. The agent keeps polling the target lifecycle state, so
+# instances resumed from a hibernated or running warm pool are completed without a reboot.
+cat > /usr/local/bin/complete-launch-lifecycle-action <<'EOF'
+#!/bin/bash
+imds() {
+  local token
+  token=$(curl -fs -X PUT http://169.254.169.254/latest/api/token -H "X-aws-ec2-metadata-token-ttl-seconds: 60") &&
+    curl -fs -H "X-aws-ec2-metadata-token: $token" "http://169.254.169.254/latest/meta-data/$1"
+}
+nginx_ready() {
+  local deadline=$((SECONDS + {{ readiness_timeout }}))
+  until curl -fs -o /dev/null http://127.0.0.1:{{ readiness_port }}/{{ readiness_path }}; do
+    [ $SECONDS -ge $deadline ] && return 1
+    sleep 5
+  done
+}
+until INSTANCE_ID=$(imds instance-id); do sleep 5; done
+completed_state=""
+while true; do
+  state=$(imds autoscaling/target-lifecycle-state)
+  case "$state" in
+    InService|Warmed:*)
+      if [ "$state" != "$completed_state" ]; then
+        if nginx_ready; then result=CONTINUE; else result=ABANDON; fi
+        echo "Target lifecycle state $state, completing the launch lifecycle action with $result"
+        # Fails when no launch lifecycle action is pending, e.g. for instances launched before the hook existed
+        aws autoscaling complete-lifecycle-action --lifecycle-action-result $result --lifecycle-hook-name {{ lifecycle_hook_name }} --auto-scaling-group-name {{ autoscaling_group_name }} --instance-id "$INSTANCE_ID" --region {{ region }} ||
+          echo "Could not complete the launch lifecycle action for $state"
+        completed_state=$state
+      fi
+      ;;
+  esac
+  sleep 5
+done
+EOF
+chmod +x /usr/local/bin/complete-launch-lifecycle-action
+
+cat > /etc/systemd/system/complete-launch-lifecycle-action.service <<'EOF'
+[Unit]
+Description=Complete the autoscaling launch lifecycle action once Nginx is ready
+Wants=network-online.target
+After=network-online.target nginx.service
+
+[Service]
+Type=simple
+ExecStart=/usr/local/bin/complete-launch-lifecycle-action
+Restart=always
+RestartSec=5
+
+[Install]
+WantedBy=multi-user.target
+EOF
+systemctl daemon-reload && systemctl enable complete-launch-lifecycle-action && systemctl restart complete-launch-lifecycle-action
 """)
 
 # Renders the user data template:
 demo_webserver_user_data = demo_webserver_user_data_template.render(
-    nginx_stub_status_config_parameter_path=nginx_stub_status_config_parameter_path, 
+    nginx_config_parameters=nginx_config_parameters,
+    nginx_cache_directory=nginx_cache_directory,
+    collectd_config_parameter_path=collectd_config_parameter_path,
+    collectd_config_file_path=collectd_config_file_path,
+    cloudwatch_agent_config_parameter_path=cloudwatch_agent_config_parameter_path,
     region=config.region,
-    nginx_config_file_path=nginx_config_file_path
+    baked_image=webserver_image_bake_enabled,
+    autoscaling_group_name=cluster_name,
+    lifecycle_hook_name=autoscaling_launch_lifecycle_hook_name,
+    readiness_port=nginx_stub_status_port,
+    readiness_path=nginx_readiness_path,
+    readiness_timeout=autoscaling_launch_readiness_timeout
 )
 
 # Encodes the user data to be used in a launch template:
@@ -1,6 +1,7 @@
 import pulumi
 from pulumi_aws import ec2, config, get_availability_zones
-from settings import general_tags, demo_vpc_cidr, demo_private_subnet_cidrs, demo_public_subnet_cidrs, nginx_stub_status_port
+from lookups import read_lookup_cache, write_lookup_cache
+from settings import general_tags, demo_vpc_cidr, demo_az_count, demo_pinned_azs, demo_private_subnet_cidrs, demo_public_subnet_cidrs, nginx_stub_status_port, vpc_s3_endpoint_type, vpc_interface_endpoint_services
 
 """
 PR.PT-3 "The principle of least functionality is incorporated by configuring systems to provide only essential capabilities"
@@ -33,189 +34,80 @@ demo_igw = ec2.InternetGateway("demo-igw",
 """
 Network Access Control Lists
 """
-# Creates public subnet ACL:
+# Defines ACL rules as (protocol, cidr_block, from_port, to_port); rule numbers are assigned from 100 in steps of 10.
+# Stacks that still hold the former NetworkAclRule resources must follow the upgrade steps in the README first:
+demo_network_acl_rules = {
+    "public": {
+        "ingress": [
+            ("tcp", "0.0.0.0/0", 80, 80),
+            ("tcp", "0.0.0.0/0", 443, 443),
+            ("tcp", "0.0.0.0/0", 1024, 65535)
+        ],
+        "egress": [
+            ("tcp", "0.0.0.0/0", 80, 80),
+            ("tcp", "0.0.0.0/0", 443, 443),
+            ("tcp", "0.0.0.0/0", 1024, 65535)
+        ]
+    },
+    "private": {
+        "ingress": [
+            ("tcp", demo_vpc_cidr, 80, 80),
+            ("tcp", demo_vpc_cidr, 443, 443),
+            ("tcp", demo_vpc_cidr, int(nginx_stub_status_port), int(nginx_stub_status_port)),
+            ("tcp", "0.0.0.0/0", 1024, 65535)
+        ],
+        "egress": [
+            ("tcp", "0.0.0.0/0", 80, 80),
+            ("tcp", "0.0.0.0/0", 443, 443),
+            ("tcp", "0.0.0.0/0", 1024, 65535)
+        ]
+    }
+}
+
+def network_acl_entries(rules, entry_args):
+    return [entry_args(
+        rule_no=100 + 10 * i,
+        action="allow",
+        protocol=protocol,
+        cidr_block=cidr_block,
+        from_port=from_port,
+        to_port=to_port
+    ) for i, (protocol, cidr_block, from_port, to_port) in enumerate(rules)]
+
+# Creates public subnet ACL with inline rules:
 public_acl = ec2.NetworkAcl("demo-public-acl",
     vpc_id=demo_vpc.id,
+    ingress=network_acl_entries(demo_network_acl_rules["public"]["ingress"], ec2.NetworkAclIngressArgs),
+    egress=network_acl_entries(demo_network_acl_rules["public"]["egress"], ec2.NetworkAclEgressArgs),
     tags={**general_tags, "Name": f"demo-public-acl"},
     opts=pulumi.ResourceOptions(parent=demo_vpc)
 )
 
-# Creates inbound public subnet ACL rules:
-public_network_acl_rule_inbound_100 = ec2.NetworkAclRule("public-nacl-inbound-100",
-    network_acl_id=public_acl.id,
-    rule_number=100,
-    egress=False,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block="0.0.0.0/0",
-    from_port=80,
-    to_port=80,
-    opts=pulumi.ResourceOptions(parent=public_acl)
-)
-
-public_network_acl_rule_inbound_110 = ec2.NetworkAclRule("public-nacl-inbound-110",
-    network_acl_id=public_acl.id,
-    rule_number=110,
-    egress=False,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block="0.0.0.0/0",
-    from_port=443,
-    to_port=443,
-    opts=pulumi.ResourceOptions(parent=public_acl)
-)
-
-public_network_acl_rule_inbound_120 = ec2.NetworkAclRule("public-nacl-inbound-120",
-    network_acl_id=public_acl.id,
-    rule_number=120,
-    egress=False,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block="0.0.0.0/0",
-    from_port=1024,
-    to_port=65535,
-    opts=pulumi.ResourceOptions(parent=public_acl)
-)
-
-# Creates outbound public subnet ACL rules:
-public_network_acl_rule_outbound_100 = ec2.NetworkAclRule("public-nacl-outbound-100",
-    network_acl_id=public_acl.id,
-    rule_number=100,
-    egress=True,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block="0.0.0.0/0",
-    from_port=80,
-    to_port=80,
-    opts=pulumi.ResourceOptions(parent=public_acl)
-)
-
-public_network_acl_rule_outbound_110 = ec2.NetworkAclRule("public-nacl-outbound-110",
-    network_acl_id=public_acl.id,
-    rule_number=110,
-    egress=True,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block="0.0.0.0/0",
-    from_port=443,
-    to_port=443,
-    opts=pulumi.ResourceOptions(parent=public_acl)
-)
-
-public_network_acl_rule_outbound_120 = ec2.NetworkAclRule("public-nacl-outbound-120",
-    network_acl_id=public_acl.id,
-    rule_number=120,
-    egress=True,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block="0.0.0.0/0",
-    from_port=1024,
-    to_port=65535,
-    opts=pulumi.ResourceOptions(parent=public_acl)
-)
-
-# Creates private subnet ACL:
+# Creates private subnet ACL with inline rules:
 private_acl = ec2.NetworkAcl("demo-private-acl",
     vpc_id=demo_vpc.id,
+    ingress=network_acl_entries(demo_network_acl_rules["private"]["ingress"], ec2.NetworkAclIngressArgs),
+    egress=network_acl_entries(demo_network_acl_rules["private"]["egress"], ec2.NetworkAclEgressArgs),
     tags={**general_tags, "Name": f"demo-private-acl"},
     opts=pulumi.ResourceOptions(parent=demo_vpc)
 )
 
-# Create inbound private subnet ACL rules:
-private_network_acl_rule_inbound_100 = ec2.NetworkAclRule("private-nacl-inbound-100",
-    network_acl_id=private_acl.id,
-    rule_number=100,
-    egress=False,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block=demo_vpc_cidr,
-    from_port=80,
-    to_port=80,
-    opts=pulumi.ResourceOptions(parent=private_acl)
-)
-
-private_network_acl_rule_inbound_110 = ec2.NetworkAclRule("private-nacl-inbound-110",
-    network_acl_id=private_acl.id,
-    rule_number=110,
-    egress=False,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block=demo_vpc_cidr,
-    from_port=443,
-    to_port=443,
-    opts=pulumi.ResourceOptions(parent=private_acl)
-)
-
-private_network_acl_rule_inbound_120 = ec2.NetworkAclRule("private-nacl-inbound-120",
-    network_acl_id=private_acl.id,
-    rule_number=120,
-    egress=False,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block=demo_vpc_cidr,
-    from_port=int(nginx_stub_status_port),
-    to_port=int(nginx_stub_status_port),
-    opts=pulumi.ResourceOptions(parent=private_acl)
-)
-
-private_network_acl_rule_inbound_130 = ec2.NetworkAclRule("private-nacl-inbound-130",
-    network_acl_id=private_acl.id,
-    rule_number=130,
-    egress=False,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block="0.0.0.0/0",
-    from_port=1024,
-    to_port=65535,
-    opts=pulumi.ResourceOptions(parent=private_acl)
-)
-
-# Create outbound private subnet ACL rules:
-private_network_acl_rule_outbound_100 = ec2.NetworkAclRule("private-nacl-outbound-100",
-    network_acl_id=private_acl.id,
-    rule_number=100,
-    egress=True,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block="0.0.0.0/0",
-    from_port=80,
-    to_port=80,
-    opts=pulumi.ResourceOptions(parent=private_acl)
-)
-
-private_network_acl_rule_outbound_110 = ec2.NetworkAclRule("private-nacl-outbound-110",
-    network_acl_id=private_acl.id,
-    rule_number=110,
-    egress=True,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block="0.0.0.0/0",
-    from_port=443,
-    to_port=443,
-    opts=pulumi.ResourceOptions(parent=private_acl)
-)
-
-private_network_acl_rule_outbound_120 = ec2.NetworkAclRule("private-nacl-outbound-120",
-    network_acl_id=private_acl.id,
-    rule_number=120,
-    egress=True,
-    protocol="tcp",
-    rule_action="allow",
-    cidr_block="0.0.0.0/0",
-    from_port=1024,
-    to_port=65535,
-    opts=pulumi.ResourceOptions(parent=private_acl)
-)
-
 """
-Demo Subnet Topology: two public subnets and two private subnets
+Demo Subnet Topology: a public subnet and a private subnet in each of demo_az_count availability zones
 """
 # Create subnets:
-demo_azs = get_availability_zones(state="available").names
+# AZ names key the subnet resource names, so they must be known up front: use the stack pin or the lookup cache before invoking
+demo_azs_lookup_key = f"availability-zones/{config.region}"
+demo_azs = demo_pinned_azs or read_lookup_cache(demo_azs_lookup_key)
+if demo_azs is None:
+    demo_azs = write_lookup_cache(demo_azs_lookup_key, get_availability_zones(state="available").names)
+if len(demo_azs) < demo_az_count:
+    raise ValueError(f"{config.region} has {len(demo_azs)} available zones, {demo_az_count} requested")
 demo_public_subnets = []
 demo_private_subnets = []
+demo_private_route_tables = []
 
-for i in range(2):
+for i in range(demo_az_count):
     prefix = f"{demo_azs[i]}"
     
     demo_public_subnet = ec2.Subnet(f"demo-public-subnet-{prefix}",
@@ -289,6 +181,8 @@ for i in range(2):
         tags={**general_tags, "Name": f"demo-private-rt-{prefix}"},
         opts=pulumi.ResourceOptions(parent=demo_private_subnet)
     )
+
+    demo_private_route_tables.append(demo_private_route_table)
     
     demo_private_route_table_association = ec2.RouteTableAssociation(f"demo-private-rt-association-{prefix}",
         route_table_id=demo_private_route_table.id,
@@ -306,12 +200,12 @@ for i in range(2):
 """
 Private Endpoints in the Demo Virtual Private Cloud
 """
-# Creates an SSM Parameter Store endpoint security group:
-demo_sg_ssm_endpoint = ec2.SecurityGroup("demo-vpc-ssm-security-group",
-    description="Allow fetching SSM parameters from private subnets",
+# Creates an interface endpoint security group shared by every catalog endpoint, keeping the resource name it had as the SSM endpoint group:
+demo_sg_interface_endpoint = ec2.SecurityGroup("demo-vpc-ssm-security-group",
+    description="Allow reaching interface VPC endpoints from private subnets",
     vpc_id=demo_vpc.id,
     ingress=[ec2.SecurityGroupIngressArgs(
-        description="Allow HTTPS communication with SSM Parameter Store",
+        description="Allow HTTPS communication with interface VPC endpoints",
         from_port=443,
         to_port=443,
         protocol="tcp",
@@ -323,50 +217,66 @@ demo_sg_ssm_endpoint = ec2.SecurityGroup("demo-vpc-ssm-security-group",
         protocol="-1",
         cidr_blocks=["0.0.0.0/0"]
     )],
-    tags={**general_tags, "Name": f"demo-vpc-ssm-sg-{config.region}"},
+    tags={**general_tags, "Name": f"demo-vpc-endpoint-sg-{config.region}"},
     opts=pulumi.ResourceOptions(parent=demo_vpc)
 )
 
-# Creates VPC Endpoints to enable private communication to SSM Parameter Store:
-ssm_endpoint_services = ["ssm", "ssmmessages", "ec2messages"]
-ssm_vpc_endpoints = []
-for endpoint_service in ssm_endpoint_services:
-    ssm_vpc_endpoints.append(ec2.VpcEndpoint(f"demo-endpoint-{endpoint_service}",
+# Creates VPC Endpoints to keep SSM, telemetry and control-plane traffic off the NAT gateways:
+demo_interface_endpoints = {}
+for endpoint_service, endpoint_enabled in vpc_interface_endpoint_services.items():
+    if not endpoint_enabled:
+        continue
+    demo_interface_endpoints[endpoint_service] = ec2.VpcEndpoint(f"demo-endpoint-{endpoint_service}",
         vpc_id=demo_vpc.id,
         service_name=f"com.amazonaws.{config.region}.{endpoint_service}",
         vpc_endpoint_type="Interface",
+        private_dns_enabled=True,
         subnet_ids=demo_private_subnets,
-        security_group_ids=[demo_sg_ssm_endpoint.id],
+        security_group_ids=[demo_sg_interface_endpoint.id],
         tags={**general_tags, "Name": f"demo-{endpoint_service}-endpoint-{config.region}"},
-        opts=pulumi.ResourceOptions(parent=demo_vpc)))
+        opts=pulumi.ResourceOptions(parent=demo_vpc))
 
-# Creates an S3 endpoint security group:
-demo_sg_s3_endpoint = ec2.SecurityGroup("demo-vpc-s3-security-group",
-    description="Allow fetching S3 content from private subnets",
-    vpc_id=demo_vpc.id,
-    ingress=[ec2.SecurityGroupIngressArgs(
-        description="Allow HTTPS communication with S3",
-        from_port=443,
-        to_port=443,
-        protocol="tcp",
-        cidr_blocks=[demo_vpc_cidr]
-    )],
-    egress=[ec2.SecurityGroupEgressArgs(
-        from_port=0,
-        to_port=0,
-        protocol="-1",
-        cidr_blocks=["0.0.0.0/0"]
-    )],
-    tags={**general_tags, "Name": f"demo-vpc-s3-sg-{config.region}"},
-    opts=pulumi.ResourceOptions(parent=demo_vpc)
-)
+if vpc_s3_endpoint_type == "Interface":
+    # Creates an S3 endpoint security group:
+    demo_sg_s3_endpoint = ec2.SecurityGroup("demo-vpc-s3-security-group",
+        description="Allow fetching S3 content from private subnets",
+        vpc_id=demo_vpc.id,
+        ingress=[ec2.SecurityGroupIngressArgs(
+            description="Allow HTTPS communication with S3",
+            from_port=443,
+            to_port=443,
+            protocol="tcp",
+            cidr_blocks=[demo_vpc_cidr]
+        )],
+        egress=[ec2.SecurityGroupEgressArgs(
+            from_port=0,
+            to_port=0,
+            protocol="-1",
+            cidr_blocks=["0.0.0.0/0"]
+        )],
+        tags={**general_tags, "Name": f"demo-vpc-s3-sg-{config.region}"},
+        opts=pulumi.ResourceOptions(parent=demo_vpc)
+    )
 
-# Creates an S3 VPC Endpoint:
-demo_s3_endpoint = ec2.VpcEndpoint("demo-endpoint-s3",
-    vpc_id=demo_vpc.id,
-    service_name=f"com.amazonaws.{config.region}.s3",
-    vpc_endpoint_type="Interface",
-    subnet_ids=demo_private_subnets,
-    security_group_ids=[demo_sg_s3_endpoint.id],
-    tags={**general_tags, "Name": f"demo-s3-endpoint-{config.region}"},
-    opts=pulumi.ResourceOptions(parent=demo_vpc))
\ No newline at end of file
+    # Creates an S3 VPC Endpoint:
+    demo_s3_endpoint = ec2.VpcEndpoint("demo-endpoint-s3",
+        vpc_id=demo_vpc.id,
+        service_name=f"com.amazonaws.{config.region}.s3",
+        vpc_endpoint_type="Interface",
+        subnet_ids=demo_private_subnets,
+        security_group_ids=[demo_sg_s3_endpoint.id],
+        tags={**general_tags, "Name": f"demo-s3-endpoint-{config.region}"},
+        opts=pulumi.ResourceOptions(parent=demo_vpc))
+
+    demo_s3_endpoint_dependencies = [demo_s3_endpoint, demo_sg_s3_endpoint]
+else:
+    # Creates an S3 Gateway VPC Endpoint attached to every private route table:
+    demo_s3_endpoint = ec2.VpcEndpoint("demo-endpoint-s3-gateway",
+        vpc_id=demo_vpc.id,
+        service_name=f"com.amazonaws.{config.region}.s3",
+        vpc_endpoint_type="Gateway",
+        route_table_ids=[route_table.id for route_table in demo_private_route_tables],
+        tags={**general_tags, "Name": f"demo-s3-endpoint-{config.region}"},
+        opts=pulumi.ResourceOptions(parent=demo_vpc))
+
+    demo_s3_endpoint_dependencies = [demo_s3_endpoint]
\ No newline at end of file
@@ -0,0 +1,170 @@
+import json
+import pulumi
+from jinja2 import Template
+from pulumi_aws import ec2, iam, imagebuilder, config
+from settings import (general_tags, cluster_name, webserver_image_bake_enabled, webserver_image_version,
+    webserver_image_build_instance_type, nginx_config_parameters, webserver_architecture, webserver_ami_id, nginx_cache_directory)
+from vpc import demo_vpc, demo_private_subnets
+from nginx_config import demo_nginx_configuration_parameters
+from lookups import read_lookup_cache, write_lookup_cache
+
+"""
+Web Server Base Image
+"""
+# Resolves the Amazon Linux 2 AMI from the stack pin, the lookup cache, or a non-blocking lookup in that order:
+demo_ami_lookup_key = f"ami/{config.region}/{webserver_architecture}"
+demo_base_image_id = webserver_ami_id or read_lookup_cache(demo_ami_lookup_key)
+
+if demo_base_image_id is None:
+    # Fetch an Amazon Linux 2 AMI matching the web server instance architecture
+    demo_ami = ec2.get_ami_output(most_recent=True,
+        filters=[
+            ec2.GetAmiFilterArgs(
+                name="name",
+                values=["amzn2-ami-kernel-5.10-*"],
+            ),
+            ec2.GetAmiFilterArgs(
+                name="virtualization-type",
+                values=["hvm"],
+            ),
+            ec2.GetAmiFilterArgs(
+                name="root-device-type",
+                values=["ebs"],
+            ),
+            ec2.GetAmiFilterArgs(
+                name="architecture",
+                values=[webserver_architecture]
+            )
+        ],
+        owners=["amazon"]
+    )
+
+    demo_base_image_id = demo_ami.image_id.apply(lambda image_id: write_lookup_cache(demo_ami_lookup_key, image_id))
+
+# The launch template boots from the raw base image unless the image pipeline below is enabled:
+demo_webserver_image_id = demo_base_image_id
+
+"""
+Web Server Image Pipeline: bakes Nginx and its configuration into an AMI with EC2 Image Builder
+"""
+# Creates an Image Builder component document template:
+demo_nginx_component_document_template = Template("""
+name: demo-nginx-webserver
+description: Installs and configures Nginx for the demo web server fleet
+schemaVersion: 1.0
+phases:
+  - name: build
+    steps:
+      - name: InstallNginx
+        action: ExecuteBash
+        inputs:
+          commands:
+            - yum update -y
+            - amazon-linux-extras install nginx1.12 -y
+            - amazon-linux-extras install collectd -y
+            - yum install -y collectd-nginx amazon-cloudwatch-agent
+            {%- for parameter_path, file_path in nginx_config_parameters.items() %}
+            - aws ssm get-parameter --name {{ parameter_path }} --region {{ region }} --output text --query Parameter.Value > {{ file_path }}
+            {%- endfor %}
+            - install -d -o nginx -g nginx {{ nginx_cache_directory }}
+            - systemctl enable nginx collectd
+  - name: validate
+    steps:
+      - name: ValidateNginx
+        action: ExecuteBash
+        inputs:
+          commands:
+            - nginx -t
+            - test -x /opt/aws/amazon-cloudwatch-agent/bin/amazon-cloudwatch-agent-ctl
+""")
+
+if webserver_image_bake_enabled:
+    # Creates an Image Builder instance role:
+    demo_image_builder_role = iam.Role("demo-image-builder-role",
+        assume_role_policy=json.dumps({
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Action": "sts:AssumeRole",
+                "Effect": "Allow",
+                "Sid": "",
+                "Principal": {
+                    "Service": "ec2.amazonaws.com",
+                },
+            }],
+        }),
+        tags={**general_tags, "Name": "demo-image-builder-role"}
+    )
+
+    image_builder_policy_arns = [
+        "arn:aws:iam::aws:policy/EC2InstanceProfileForImageBuilder",
+        "arn:aws:iam::aws:policy/AmazonSSMManagedInstanceCore"
+    ]
+
+    for i, policy_arn in enumerate(image_builder_policy_arns):
+        iam.RolePolicyAttachment(f"demo-image-builder-policy-attachment-{i}",
+            role=demo_image_builder_role.name,
+            policy_arn=policy_arn,
+            opts=pulumi.ResourceOptions(parent=demo_image_builder_role)
+        )
+
+    demo_image_builder_instance_profile = iam.InstanceProfile("demo-image-builder-instance-profile",
+        role=demo_image_builder_role.name,
+        opts=pulumi.ResourceOptions(parent=demo_image_builder_role)
+    )
+
+    # Creates an egress-only security group for the build instance:
+    demo_sg_image_builder = ec2.SecurityGroup("demo-image-builder-security-group",
+        description="Allow the image build instance to reach package repositories and SSM",
+        vpc_id=demo_vpc.id,
+        egress=[ec2.SecurityGroupEgressArgs(
+            from_port=0,
+            to_port=0,
+            protocol="-1",
+            cidr_blocks=["0.0.0.0/0"]
+        )],
+        tags={**general_tags, "Name": f"demo-image-builder-sg-{config.region}"},
+        opts=pulumi.ResourceOptions(parent=demo_vpc)
+    )
+
+    # Creates the Nginx component, recipe and build infrastructure:
+    demo_nginx_component = imagebuilder.Component("demo-nginx-component",
+        name="demo-nginx-webserver",
+        platform="Linux",
+        version=webserver_image_version,
+        data=demo_nginx_component_document_template.render(
+            nginx_config_parameters=nginx_config_parameters,
+            nginx_cache_directory=nginx_cache_directory,
+            region=config.region
+        ),
+        tags={**general_tags, "Name": "demo-nginx-component"}
+    )
+
+    demo_webserver_image_recipe = imagebuilder.ImageRecipe("demo-webserver-image-recipe",
+        name=f"{cluster_name}-webserver",
+        parent_image=demo_base_image_id,
+        version=webserver_image_version,
+        components=[imagebuilder.ImageRecipeComponentArgs(
+            component_arn=demo_nginx_component.arn
+        )],
+        tags={**general_tags, "Name": "demo-webserver-image-recipe"}
+    )
+
+    demo_image_builder_infrastructure = imagebuilder.InfrastructureConfiguration("demo-image-builder-infrastructure",
+        name=f"{cluster_name}-image-builder",
+        instance_profile_name=demo_image_builder_instance_profile.name,
+        instance_types=[webserver_image_build_instance_type],
+        subnet_id=demo_private_subnets[0].id,
+        security_group_ids=[demo_sg_image_builder.id],
+        terminate_instance_on_failure=True,
+        tags={**general_tags, "Name": "demo-image-builder-infrastructure"}
+    )
+
+    # Builds the web server image:
+    demo_webserver_image = imagebuilder.Image("demo-webserver-image",
+        image_recipe_arn=demo_webserver_image_recipe.arn,
+        infrastructure_configuration_arn=demo_image_builder_infrastructure.arn,
+        tags={**general_tags, "Name": "demo-webserver-image"},
+        opts=pulumi.ResourceOptions(depends_on=demo_nginx_configuration_parameters)
+    )
+
+    demo_webserver_image_id = demo_webserver_image.output_resources.apply(lambda resources: resources[0].amis[0].image)